@@ -12,8 +12,8 @@ from divik.core.io import (
 
 
 @gin.configurable
-def load_data(path=gin.REQUIRED):
-    return try_load_data(path)
+def load_data(path=gin.REQUIRED, dtype=None):
+    return try_load_data(path, dtype=dtype)
 
 
 @gin.configurable
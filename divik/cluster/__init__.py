@@ -1,16 +1,19 @@
 """Clustering methods"""
-from ._divik import DiviK
+from ._divik import CompiledDiviK, DiviK
 from ._kmeans import (
     DunnSearch,
     GAPSearch,
     KMeans,
+    VarianceRatioSearch,
 )
 from ._two_step import TwoStep
 
 __all__ = [
+    "CompiledDiviK",
     "DiviK",
     "DunnSearch",
     "GAPSearch",
     "KMeans",
     "TwoStep",
+    "VarianceRatioSearch",
 ]
@@ -1,3 +1,4 @@
 """DiviK algorithm implementation."""
 
+from ._compiled import CompiledDiviK
 from ._sklearn import DiviK
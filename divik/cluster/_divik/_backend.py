@@ -1,27 +1,62 @@
 import gc
+import inspect
+import uuid
 from functools import partial
-from typing import Optional, Union
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
 
 import numpy as np
 from sklearn import clone
 
-from divik.core import Data, DivikResult
+from divik.core import Data, DivikResult, get_n_jobs, maybe_pool, share
 
+from ._checkpoint import Checkpoint
 from ._report import DivikReporter
 
+_DATA = {}
+
+
+def _pool_initialize(ref, data):
+    _DATA[ref] = data
+
+
+def _as_indices(selection: np.ndarray) -> np.ndarray:
+    """Compact indices of the observations selected by a mask or indices"""
+    selection = np.asarray(selection)
+    if selection.dtype == bool:
+        size = selection.size
+        selection = np.flatnonzero(selection)
+    else:
+        size = selection.max(initial=0) + 1
+    dtype = np.int32 if size <= np.iinfo(np.int32).max else np.intp
+    return selection.astype(dtype, copy=False)
+
 
 def _recursive_selection(
     current_selection: np.ndarray, partition: np.ndarray, cluster_number: int
 ) -> np.ndarray:
-    selection = np.zeros(shape=current_selection.shape, dtype=bool)
-    selection[current_selection] = partition == cluster_number
-    return selection
+    return current_selection[partition == cluster_number]
 
 
 StatSelector = "divik.feature_selection.StatSelectorMixin"
 DunnSearch = "divik.cluster._kmeans._dunn.DunnSearch"
 GAPSearch = "divik.cluster._kmeans._gap.GAPSearch"
-AutoKMeans = Union[DunnSearch, GAPSearch]
+VarianceRatioSearch = "divik.cluster._kmeans._variance_ratio.VarianceRatioSearch"
+AutoKMeans = Union[DunnSearch, GAPSearch, VarianceRatioSearch]
+Path = Tuple[int, ...]
+
+
+def _stop_check_fits(fast_kmeans: GAPSearch):
+    fitted = fast_kmeans.estimators_
+    if fitted is None:  # dropped, but the best one remains
+        fitted = [fast_kmeans.best_]
+    return [kmeans for kmeans in fitted if kmeans is not None]
+
+
+def _fit_reusing(kmeans: AutoKMeans, X: Data, fitted):
+    kmeans = clone(kmeans)
+    if "fitted" in inspect.signature(kmeans.fit).parameters:
+        return kmeans.fit(X, fitted=fitted)
+    return kmeans.fit(X)
 
 
 def check_stop_and_split(
@@ -32,76 +67,210 @@ def check_stop_and_split(
         report.stop_check()
         kmeans_ = clone(kmeans).fit(X)
         if not kmeans_.fitted_ or kmeans_.n_clusters_ == 1:
-            report.finished_for(X.shape[0])
             return None
     else:  # stop condition check & DunnSearch
         report.stop_check()
         fast_kmeans = clone(fast_kmeans).fit(X)
         if fast_kmeans.fitted_ and fast_kmeans.n_clusters_ == 1:
-            report.finished_for(X.shape[0])
             return None
         report.processing(X)
-        kmeans_ = clone(kmeans).fit(X)
+        kmeans_ = _fit_reusing(kmeans, X, _stop_check_fits(fast_kmeans))
     return kmeans_
 
 
-# @gmrukwa: I could not find more readable solution than recursion for now.
-def divik(
+class _Outcome(NamedTuple):
+    """Result of processing a single node of the tree"""
+
+    size: int
+    """Number of observations in the node"""
+    result: Optional[DivikResult]
+    """Split of the node, without subregions"""
+    rejected: bool = False
+    """Whether the split was rejected due to a too small cluster"""
+
+
+def _gather(data: Data, indices: np.ndarray, columns: np.ndarray) -> Data:
+    """Selected features of the observations in a single copy"""
+    return data[np.ix_(indices, columns)]
+
+
+def divide(
     data: Data,
-    selection: np.ndarray,
+    indices: np.ndarray,
     kmeans: AutoKMeans,
     fast_kmeans: GAPSearch,
     feature_selector: StatSelector,
     minimal_size: int,
     rejection_size: int,
     report: DivikReporter,
-) -> Optional[DivikResult]:
-    subset = data[selection]
+) -> _Outcome:
+    """Split a single node of the tree, independently of the other nodes
 
-    if subset.shape[0] <= max(kmeans.max_clusters, minimal_size):
-        report.finished_for(subset.shape[0])
-        return None
+    @param indices: indices of the observations of the node in the data
+    """
+    size = indices.size
 
+    if size <= max(kmeans.max_clusters, minimal_size):
+        return _Outcome(size, None)
+
+    subset = data[indices]
     report.filter(subset)
-    feature_selector = clone(feature_selector)
-    filtered_data = feature_selector.fit_transform(subset)
+    feature_selector = clone(feature_selector).fit(subset)
+    columns = feature_selector.get_support(indices=True)
+    if columns.size == subset.shape[1]:  # no copy if all features are kept
+        filtered_data, subset = subset, None
+    else:  # rows are released before the selected features are gathered
+        subset = None
+        filtered_data = _gather(data, indices, columns)
     report.filtered(filtered_data)
 
     kmeans_ = check_stop_and_split(kmeans, fast_kmeans, filtered_data, report)
+    del filtered_data
 
     if kmeans_ is None:
-        return None
+        return _Outcome(size, None)
 
     partition = kmeans_.labels_
     _, counts = np.unique(partition, return_counts=True)
 
     if any(counts <= rejection_size):
-        report.rejected(subset.shape[0])
+        return _Outcome(size, None, rejected=True)
+
+    return _Outcome(
+        size,
+        DivikResult(
+            clustering=kmeans_,
+            feature_selector=feature_selector,
+            merged=partition,
+            subregions=[],
+        ),
+    )
+
+
+def _shared_divide(indices: np.ndarray, data_ref, **kwargs) -> _Outcome:
+    return divide(_DATA[data_ref].value, indices, **kwargs)
+
+
+def _sequential(estimator):
+    """Clone of the estimator with all the nested jobs limited to one"""
+    if estimator is None:
+        return None
+    names = estimator.get_params(deep=True)
+    n_jobs = {n: 1 for n in names if n == "n_jobs" or n.endswith("__n_jobs")}
+    return clone(estimator).set_params(**n_jobs)
+
+
+def _k_width(kmeans: AutoKMeans) -> int:
+    """Number of the clustering runs that can be executed concurrently"""
+    return kmeans.max_clusters - getattr(kmeans, "min_clusters", 1) + 1
+
+
+def _assemble(
+    path: Path, splits: Dict[Path, DivikResult], report: DivikReporter
+) -> Optional[DivikResult]:
+    split = splits.get(path)
+    if split is None:
         return None
+    subregions = [
+        _assemble(path + (i,), splits, report)
+        for i in range(np.unique(split.merged).size)
+    ]
+    report.assemble()
+    return split._replace(subregions=subregions)
+
+
+def divik(
+    data: Data,
+    selection: np.ndarray,
+    kmeans: AutoKMeans,
+    fast_kmeans: GAPSearch,
+    feature_selector: StatSelector,
+    minimal_size: int,
+    rejection_size: int,
+    report: DivikReporter,
+    n_jobs: int = 1,
+    checkpoint: Checkpoint = None,
+) -> Optional[DivikResult]:
+    """Divide the data recursively, level by level of the tree
 
-    report.recurring(len(counts))
-    recurse = partial(
-        divik,
-        data=data,
+    Nodes of a level are independent. While there are fewer of them than
+    the clustering runs of a single node, the nodes are processed one by
+    one and ``kmeans`` parallelize the runs within the node. Afterwards,
+    the whole nodes are processed concurrently, each in a single job. The
+    tree is the same as computed sequentially.
+
+    Nodes refer to their observations by compact indices, so only the
+    observations of a node are copied when it is processed.
+
+    @param selection: boolean mask or indices of the observations to divide
+    @param n_jobs: CPU budget for the concurrent processing of nodes
+    @param checkpoint: storage of the processed nodes; nodes already stored
+    are not processed again
+    """
+    n_jobs = get_n_jobs(n_jobs)
+    config = dict(
         kmeans=kmeans,
         fast_kmeans=fast_kmeans,
         feature_selector=feature_selector,
         minimal_size=minimal_size,
         rejection_size=rejection_size,
-        report=report,
     )
-    del subset
-    del filtered_data
-    gc.collect()
-    subregions = [
-        recurse(selection=_recursive_selection(selection, partition, cluster))
-        for cluster in np.unique(partition)
-    ]
-
-    report.assemble()
-    return DivikResult(
-        clustering=kmeans_,
-        feature_selector=feature_selector,
-        merged=partition,
-        subregions=subregions,
+    node_config = dict(
+        config,
+        kmeans=_sequential(kmeans),
+        fast_kmeans=_sequential(fast_kmeans),
+        report=DivikReporter(warn_const=report.warn_const),
     )
+    done = {} if checkpoint is None else checkpoint.load()
+    splits: Dict[Path, DivikResult] = {}
+    frontier: List[Tuple[Path, np.ndarray]] = [((), _as_indices(selection))]
+    ref = str(uuid.uuid4())
+    with share(data) as shared:
+        _DATA[ref] = shared
+        with maybe_pool(
+            n_jobs, initializer=_pool_initialize, initargs=(ref, shared)
+        ) as pool:
+            while frontier:
+                pending = [node for node in frontier if node[0] not in done]
+                indices = [node_indices for _, node_indices in pending]
+                if len(pending) >= min(n_jobs, _k_width(kmeans)) > 1:
+                    divide_ = partial(_shared_divide, data_ref=ref, **node_config)
+                    outcomes = pool.imap(divide_, indices)
+                else:
+                    divide_ = partial(divide, data, report=report, **config)
+                    outcomes = map(divide_, indices)
+                # each node is stored as soon as it is processed
+                for (path, node_indices), outcome in zip(pending, outcomes):
+                    done[path] = outcome
+                    if checkpoint is not None:
+                        checkpoint.save(path, node_indices, outcome)
+                outcomes = [done[path] for path, _ in frontier]
+                frontier = _expand(frontier, outcomes, splits, report)
+                gc.collect()
+        del _DATA[ref]
+    return _assemble((), splits, report)
+
+
+def _expand(
+    frontier: List[Tuple[Path, np.ndarray]],
+    outcomes: List[_Outcome],
+    splits: Dict[Path, DivikResult],
+    report: DivikReporter,
+) -> List[Tuple[Path, np.ndarray]]:
+    """Record the splits of a level and list the nodes of the next one"""
+    children = []
+    for (path, indices), outcome in zip(frontier, outcomes):
+        if outcome.rejected:
+            report.rejected(outcome.size)
+        elif outcome.result is None:
+            report.finished_for(outcome.size)
+        else:
+            splits[path] = outcome.result
+            partition = outcome.result.merged
+            clusters = np.unique(partition)
+            report.recurring(clusters.size)
+            children.extend(
+                (path + (i,), _recursive_selection(indices, partition, cluster))
+                for i, cluster in enumerate(clusters)
+            )
+    return children
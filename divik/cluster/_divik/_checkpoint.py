@@ -0,0 +1,146 @@
+"""Persistence of the processed nodes of DiviK tree
+
+Each processed node is pickled to a separate file as soon as its level is
+done, so a run can be resumed after a failure and its partial results can
+be inspected while it runs.
+"""
+import glob
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from divik.core import Data
+
+Path = Tuple[int, ...]
+Outcome = "divik.cluster._divik._backend._Outcome"
+_DATA_FILE = "data.pkl"
+_NODE_PREFIX = "node"
+
+
+def _digest(data: Data) -> str:
+    return hashlib.blake2b(np.ascontiguousarray(data).data).hexdigest()
+
+
+# do not affect the tree
+_TECHNICAL_PARAMS = ("n_jobs", "verbose", "checkpoint_dir")
+
+
+def _params_digest(params: Dict[str, Any]) -> str:
+    relevant = sorted(
+        (name, value)
+        for name, value in params.items()
+        if name.split("__")[-1] not in _TECHNICAL_PARAMS
+        and not hasattr(value, "get_params")  # expanded by deep get_params
+    )
+    return hashlib.blake2b(pickle.dumps(relevant)).hexdigest()
+
+
+def _node_name(path: Path) -> str:
+    return "-".join([_NODE_PREFIX] + [str(i) for i in path]) + ".pkl"
+
+
+def _node_path(name: str) -> Path:
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return tuple(int(i) for i in stem.split("-")[1:])
+
+
+def _dump(obj, fname: str):
+    # the file appears complete or not at all
+    temporary = fname + ".tmp"
+    with open(temporary, "wb") as out:
+        pickle.dump(obj, out)
+    os.replace(temporary, fname)
+
+
+def _load(fname: str):
+    with open(fname, "rb") as infile:
+        return pickle.load(infile)
+
+
+class Checkpoint:
+    """Directory with the processed nodes of DiviK tree
+
+    Each node file holds a dictionary with the ``path`` of the node in the
+    tree, ``indices`` of its observations in the data and the ``outcome``
+    of its processing, i.e. the fitted clustering and feature selector
+    unless the node was not split.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _fname(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def open(self, data: Data, params: Dict[str, Any]):
+        """Prepare the directory for the data, checking the stored nodes
+
+        @param data: data clustered by DiviK
+        @param params: deep parameters of DiviK; those not affecting the
+        tree, like ``n_jobs``, are ignored
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        description = {
+            "shape": data.shape,
+            "digest": _digest(data),
+            "params": _params_digest(params),
+        }
+        fname = self._fname(_DATA_FILE)
+        if not os.path.exists(fname):
+            _dump(description, fname)
+        elif _load(fname) != description:
+            msg = (
+                f"Checkpoint {self.directory} was created for different data "
+                + "or configuration."
+            )
+            logging.error(msg)
+            raise ValueError(msg)
+        return self
+
+    def resume(self, data: Data, params: Dict[str, Any]):
+        """Open the checkpoint of an interrupted run, which must exist
+
+        @param data: data clustered by DiviK
+        @param params: deep parameters of DiviK
+        """
+        if not os.path.exists(self._fname(_DATA_FILE)):
+            msg = f"There is no checkpoint to resume from in {self.directory}."
+            logging.error(msg)
+            raise FileNotFoundError(msg)
+        return self.open(data, params)
+
+    def clear(self):
+        """Remove the stored nodes and the description of the data"""
+        names = [_DATA_FILE, _NODE_PREFIX + "*.pkl", _NODE_PREFIX + "*.pkl.tmp"]
+        stored = [fname for name in names for fname in glob.glob(self._fname(name))]
+        if stored:
+            logging.info(f"Removing {len(stored)} files from {self.directory}.")
+        for fname in stored:
+            os.remove(fname)
+        return self
+
+    def load(self) -> Dict[Path, Outcome]:
+        """Outcomes of the processed nodes by their paths"""
+        pattern = self._fname(_NODE_PREFIX + "*.pkl")
+        outcomes = {
+            _node_path(fname): _load(fname)["outcome"] for fname in glob.glob(pattern)
+        }
+        logging.info(f"Loaded {len(outcomes)} processed nodes from {self.directory}.")
+        return outcomes
+
+    def save(self, path: Path, indices: np.ndarray, outcome: Outcome):
+        """Store the outcome of processing of a node"""
+        node = {"path": path, "indices": indices, "outcome": outcome}
+        _dump(node, self._fname(_node_name(path)))
+
+    def extend(self, other: "Checkpoint"):
+        """Copy the nodes stored in other checkpoint"""
+        if os.path.abspath(other.directory) == os.path.abspath(self.directory):
+            return
+        for fname in glob.glob(other._fname(_NODE_PREFIX + "*.pkl")):
+            shutil.copy2(fname, self._fname(os.path.basename(fname)))
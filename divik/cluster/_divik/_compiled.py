@@ -0,0 +1,237 @@
+"""Flat, array-only representation of a fitted DiviK tree
+
+Nodes are numbered level by level, starting with 0 for the root. Each node
+keeps the indices of its selected features and the centroids of its
+clustering, so the tree can be evaluated without the estimators that
+built it.
+"""
+import logging
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from scipy.spatial import distance as dist
+
+from divik.core import DivikResult, normalize_rows
+from divik.core._distance import block_rows, closest
+
+from ._backend import _gather
+
+PREDICT_BYTES = 64 * 2 ** 20
+# ids of the distances are stored in compiled trees, so new distances must
+# be appended at the end
+DISTANCES = (
+    "braycurtis",
+    "canberra",
+    "chebyshev",
+    "cityblock",
+    "correlation",
+    "cosine",
+    "euclidean",
+    "jensenshannon",
+    "sqeuclidean",
+)
+Path = Tuple[int, ...]
+
+
+def _distance_id(distance: str) -> int:
+    if distance not in DISTANCES:
+        msg = f"Distance {distance} cannot be compiled, use one of {DISTANCES}."
+        logging.error(msg)
+        raise ValueError(msg)
+    return DISTANCES.index(distance)
+
+
+class CompiledDiviK(NamedTuple):
+    """Fitted DiviK tree flattened into contiguous arrays
+
+    Created with ``DiviK.compile``. The arrays back the ``predict`` and
+    ``transform`` methods and are all that is stored with ``save``.
+    """
+
+    children: np.ndarray
+    """Node id of each subregion of a node, -1 if it is a leaf"""
+    leaves: np.ndarray
+    """Final cluster number of each subregion of a node, -1 if it is split"""
+    features: np.ndarray
+    """Indices of the selected features of all nodes, concatenated"""
+    feature_offsets: np.ndarray
+    """Start of the features of each node and the end of the last one"""
+    centroids: np.ndarray
+    """Flattened centroids of all nodes, concatenated"""
+    centroid_offsets: np.ndarray
+    """Start of the centroids of each node and the end of the last one"""
+    distances: np.ndarray
+    """Id of the distance of the clustering of each node"""
+    normalize: np.ndarray
+    """Whether the clustering of each node normalizes rows"""
+    normalize_input: bool
+    """Whether the rows are normalized before they enter the tree"""
+    filters: np.ndarray
+    """Features filter of each final cluster"""
+    cluster_centers: np.ndarray
+    """Centroids of the final clusters"""
+    distance: int
+    """Id of the distance to the final clusters"""
+
+    @property
+    def n_nodes(self) -> int:
+        return self.children.shape[0]
+
+    def _node(self, node: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.feature_offsets[node : node + 2]
+        features = self.features[start:end]
+        start, end = self.centroid_offsets[node : node + 2]
+        centroids = self.centroids[start:end].reshape(-1, features.size)
+        return features, centroids
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        labels = np.zeros((X.shape[0],), dtype=np.int32)
+        level = [(0, np.arange(X.shape[0]))] if self.n_nodes else []
+        while level:
+            next_level = []
+            for node, indices in level:
+                features, centroids = self._node(node)
+                local_X = _gather(X, indices, features)
+                if self.normalize[node]:
+                    local_X = normalize_rows(local_X)
+                distance = DISTANCES[self.distances[node]]
+                predicted, _ = closest(local_X, centroids, distance)
+                for label in range(centroids.shape[0]):
+                    selected = indices[predicted == label]
+                    if self.children[node, label] == -1:
+                        labels[selected] = self.leaves[node, label]
+                    elif selected.size:
+                        next_level.append((self.children[node, label], selected))
+            level = next_level
+        return labels
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predict the closest cluster each sample in X belongs to.
+
+        Parameters
+        ----------
+
+        X : array, shape = [n_samples, n_features]
+            New data to predict.
+
+        Returns
+        -------
+
+        labels : array, shape [n_samples,]
+            Index of the cluster each sample belongs to.
+        """
+        if self.normalize_input:
+            X = normalize_rows(X)
+        step = block_rows(X.shape[1], PREDICT_BYTES)
+        labels = np.empty((X.shape[0],), dtype=np.int32)
+        for start in range(0, X.shape[0], step):
+            labels[start : start + step] = self._predict_chunk(X[start : start + step])
+        return labels
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """Transform X to a cluster-distance space.
+
+        Final clusters of the same parent share their features filter, so
+        the features are gathered once per filter.
+
+        Parameters
+        ----------
+
+        X : array, shape = [n_samples, n_features]
+            New data to transform.
+
+        Returns
+        -------
+
+        X_new : array, shape [n_samples, n_clusters]
+            X transformed in the new space.
+        """
+        if self.normalize_input:
+            X = normalize_rows(X)
+        distance = DISTANCES[self.distance]
+        filters, groups = np.unique(self.filters, axis=0, return_inverse=True)
+        groups = np.ravel(groups)
+        distances = np.empty((X.shape[0], self.filters.shape[0]))
+        for group, selector in enumerate(filters):
+            clusters = np.flatnonzero(groups == group)
+            centroids = self.cluster_centers[np.ix_(clusters, selector)]
+            distances[:, clusters] = dist.cdist(X[:, selector], centroids, distance)
+        return distances
+
+    def save(self, fname: str):
+        """Store the arrays in a compressed ``.npz`` file"""
+        np.savez_compressed(fname, **self._asdict())
+
+    @classmethod
+    def load(cls, fname: str) -> "CompiledDiviK":
+        """Load the tree stored with ``save``"""
+        with np.load(fname, allow_pickle=False) as stored:
+            return cls(**{field: stored[field] for field in cls._fields})
+
+
+def _concatenate(arrays: List[np.ndarray], dtype) -> np.ndarray:
+    return np.concatenate(arrays) if arrays else np.empty((0,), dtype=dtype)
+
+
+def _nodes(result: Optional[DivikResult]) -> List[Tuple[Path, DivikResult]]:
+    """Split nodes of the tree with their paths, level by level"""
+    nodes = [] if result is None else [((), result)]
+    for path, division in nodes:  # grows while iterated
+        nodes.extend(
+            (path + (label,), subregion)
+            for label, subregion in enumerate(division.subregions)
+            if subregion is not None
+        )
+    return nodes
+
+
+def compile_tree(
+    result: Optional[DivikResult],
+    reverse_paths: Dict[Path, int],
+    normalize_input: bool,
+    filters: np.ndarray,
+    cluster_centers: np.ndarray,
+    distance: str,
+) -> CompiledDiviK:
+    """Flatten the tree of DiviK into arrays
+
+    @param result: tree computed by DiviK
+    @param reverse_paths: final cluster number of each path in the tree
+    @param normalize_input: whether rows are normalized before prediction
+    @param filters: features filter of each final cluster
+    @param cluster_centers: centroids of the final clusters
+    @param distance: distance to the final clusters
+    @return: compiled tree
+    """
+    nodes = _nodes(result)
+    ids = {path: node for node, (path, _) in enumerate(nodes)}
+    width = max([len(division.subregions) for _, division in nodes], default=0)
+    children = np.full((len(nodes), width), -1, dtype=np.int32)
+    leaves = np.full((len(nodes), width), -1, dtype=np.int32)
+    features, centroids, distances, normalize = [], [], [], []
+    for node, (path, division) in enumerate(nodes):
+        for label, subregion in enumerate(division.subregions):
+            if subregion is None:
+                leaves[node, label] = reverse_paths[path + (label,)]
+            else:
+                children[node, label] = ids[path + (label,)]
+        clustering = division.clustering
+        kmeans = getattr(clustering, "best_", clustering)
+        features.append(division.feature_selector.get_support(indices=True))
+        centroids.append(np.ravel(clustering.cluster_centers_))
+        distances.append(_distance_id(kmeans.distance))
+        normalize.append(bool(getattr(kmeans, "normalize_rows", False)))
+    return CompiledDiviK(
+        children=children,
+        leaves=leaves,
+        features=_concatenate(features, np.int32).astype(np.int32),
+        feature_offsets=np.cumsum([0] + [f.size for f in features]),
+        centroids=_concatenate(centroids, np.float64),
+        centroid_offsets=np.cumsum([0] + [c.size for c in centroids]),
+        distances=np.array(distances, dtype=np.int8),
+        normalize=np.array(normalize, dtype=bool),
+        normalize_input=normalize_input,
+        filters=np.asarray(filters, dtype=bool),
+        cluster_centers=np.asarray(cluster_centers),
+        distance=_distance_id(distance),
+    )
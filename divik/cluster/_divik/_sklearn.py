@@ -1,6 +1,7 @@
+import os
 import sys
 from functools import partial
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -19,13 +20,17 @@ from divik.core import (
     DivikResult,
     configurable,
     context_if,
+    get_n_jobs,
     maybe_pool,
     normalize_rows,
     visualize,
 )
+from divik.core._distance import block_rows
 from divik.core.io import saver
 
-from ._backend import divik
+from ._backend import _gather, divik
+from ._checkpoint import Checkpoint
+from ._compiled import PREDICT_BYTES, CompiledDiviK, compile_tree
 from ._report import DivikReporter
 
 
@@ -37,13 +42,14 @@ class DiviK(BaseEstimator, ClusterMixin, TransformerMixin):
     ----------
     kmeans: AutoKMeans
         A self-tuning KMeans estimator for the purpose of clustering.
-        Two implementations are provided in `divik.cluster` package:
-        `DunnSearch` and `GAPSearch`.
+        Three implementations are provided in `divik.cluster` package:
+        `DunnSearch`, `GAPSearch` and `VarianceRatioSearch`.
 
     fast_kmeans: GAPSearch, optional, default: None
         A self-tuning KMeans estimator for the purpose of stop condition
         check. If None, the `kmeans` parameter is assumed to be the
-        `GAPSearch` instance.
+        `GAPSearch` instance. `VarianceRatioSearch` with `min_clusters=1`
+        provides a cheaper check.
 
     distance: str, optional, default: 'correlation'
         The distance metric between points, centroids and for GAP index
@@ -106,9 +112,20 @@ class DiviK(BaseEstimator, ClusterMixin, TransformerMixin):
         - 'none' - feature selection is disabled
 
     n_jobs: int, optional, default: None
-        The number of jobs to use for the computation. This works by computing
-        each of the GAP index evaluations in parallel and by making predictions
-        in parallel.
+        The number of jobs to use for the computation. This works by
+        processing the independent subtrees in parallel and by making
+        predictions in parallel. While a level of the tree has fewer nodes
+        than the clustering runs of `kmeans`, the nodes are processed one by
+        one with the parallelism of `kmeans` and `fast_kmeans`. Then the
+        nodes are processed concurrently, with their estimators limited to a
+        single job each.
+
+    checkpoint_dir: str, optional, default: None
+        Directory where each processed node of the tree is stored as soon as
+        it is done, so a long run can be inspected while it runs and resumed
+        after a failure with ``fit(X, resume_from=checkpoint_dir)``. Nodes
+        stored there by a previous run are removed, unless the run is
+        resumed from this directory.
 
     verbose: bool, optional, default: False
         Whether to report the progress of the computations.
@@ -200,6 +217,7 @@ class DiviK(BaseEstimator, ClusterMixin, TransformerMixin):
         filter_type="gmm",
         n_jobs: int = None,
         verbose: bool = False,
+        checkpoint_dir: str = None,
     ):
         self.kmeans = kmeans
         self.fast_kmeans = fast_kmeans
@@ -215,6 +233,7 @@ class DiviK(BaseEstimator, ClusterMixin, TransformerMixin):
         self.filter_type = filter_type
         self.n_jobs = n_jobs
         self.verbose = verbose
+        self.checkpoint_dir = checkpoint_dir
         self._validate_arguments()
 
     def _validate_arguments(self):
@@ -232,7 +251,7 @@ class DiviK(BaseEstimator, ClusterMixin, TransformerMixin):
                 "filter_type must be in ['gmm', 'outlier', 'auto', 'none']"
             )
 
-    def fit(self, X, y=None):
+    def fit(self, X, y=None, resume_from: str = None):
         """Compute DiviK clustering.
 
         Parameters
@@ -243,14 +262,22 @@ class DiviK(BaseEstimator, ClusterMixin, TransformerMixin):
             copy if the given data is not C-contiguous.
         y : Ignored
             not used, present here for API consistency by convention.
+        resume_from : str, optional
+            Checkpoint directory of an interrupted run with the same data and
+            configuration. The nodes stored there are not processed again.
+            The run continues storing nodes to ``checkpoint_dir`` or, if it
+            is not set, to ``resume_from``. Raises FileNotFoundError if
+            there is no checkpoint in ``resume_from`` and ValueError if the
+            checkpoint was created for different data or configuration.
         """
         if np.isnan(X).any():
             raise ValueError("NaN values are not supported.")
 
+        checkpoint = self._checkpoint(X, resume_from)
         with context_if(
             self.verbose, tqdm.tqdm, total=X.shape[0], file=sys.stdout, smoothing=0
         ) as progress:
-            self.result_ = self._divik(X, progress)
+            self.result_ = self._divik(X, progress, checkpoint)
 
         if self.result_ is None:
             self.labels_ = np.zeros((X.shape[0],), dtype=int)
@@ -306,7 +333,22 @@ class DiviK(BaseEstimator, ClusterMixin, TransformerMixin):
             neutral=self.neutral,
         )
 
-    def _divik(self, X, progress):
+    def _checkpoint(self, X, resume_from: str = None) -> Optional[Checkpoint]:
+        if resume_from is None and self.checkpoint_dir is None:
+            return None
+        params = self.get_params(deep=True)
+        if self.checkpoint_dir is None:
+            return Checkpoint(resume_from).resume(X, params)
+        checkpoint = Checkpoint(self.checkpoint_dir)
+        if resume_from is None:  # nodes of a previous run are not reused
+            return checkpoint.clear().open(X, params)
+        resumed = Checkpoint(resume_from).resume(X, params)
+        if os.path.abspath(resume_from) != os.path.abspath(self.checkpoint_dir):
+            checkpoint.clear()
+        checkpoint.open(X, params).extend(resumed)
+        return checkpoint
+
+    def _divik(self, X, progress, checkpoint=None):
         full = self.kmeans
         fast = self.fast_kmeans
         warn_const = getattr(full.kmeans, "normalize_rows", False)
@@ -330,6 +372,8 @@ class DiviK(BaseEstimator, ClusterMixin, TransformerMixin):
             minimal_size=minimal_size,
             rejection_size=rejection_size,
             report=report,
+            n_jobs=self.n_jobs,
+            checkpoint=checkpoint,
         )
 
     def fit_predict(self, X, y=None):
@@ -431,24 +475,73 @@ class DiviK(BaseEstimator, ClusterMixin, TransformerMixin):
         check_is_fitted(self)
         if self._needs_normalization():
             X = normalize_rows(X)
-        predict = partial(_predict_path, result=self.result_)
-        with maybe_pool(self.n_jobs) as pool:
-            paths = pool.map(predict, X)
-        labels = [self.reverse_paths_[path] for path in paths]
-        return np.array(labels, dtype=np.int32)
-
-
-def _predict_path(observation: np.ndarray, result: DivikResult) -> Tuple[int]:
-    path = []
-    observation = observation[np.newaxis, :]
-    division = result
-    while division is not None:
-        local_X = division.feature_selector.transform(observation)
-        label = int(division.clustering.predict(local_X))
-        path.append(label)
-        division = division.subregions[label]
-    path = tuple(path) if len(path) else (0,)
-    return path
+        step = block_rows(X.shape[1], PREDICT_BYTES)
+        starts = range(0, X.shape[0], step)
+        chunks = (X[start : start + step] for start in starts)
+        predict = partial(
+            _predict_labels, result=self.result_, reverse_paths=self.reverse_paths_
+        )
+        labels = np.empty((X.shape[0],), dtype=np.int32)
+        n_jobs = max(min(get_n_jobs(self.n_jobs), len(starts)), 1)
+        with maybe_pool(n_jobs) as pool:
+            for start, chunk_labels in zip(starts, pool.imap(predict, chunks)):
+                labels[start : start + step] = chunk_labels
+        return labels
+
+    def compile(self) -> CompiledDiviK:
+        """Flatten the fitted tree into contiguous arrays.
+
+        The compiled tree holds only the selected features and centroids of
+        each node, so it predicts and transforms without the estimators of
+        the tree, and it is small to store, load and send to workers.
+
+        Returns
+        -------
+
+        compiled : CompiledDiviK
+            Tree with the same ``predict`` and ``transform`` as the model.
+            It can be stored with ``save`` and restored with
+            ``CompiledDiviK.load``.
+        """
+        check_is_fitted(self)
+        return compile_tree(
+            self.result_,
+            self.reverse_paths_,
+            normalize_input=self._needs_normalization(),
+            filters=self.filters_,
+            cluster_centers=self.centroids_,
+            distance=self.distance,
+        )
+
+
+def _predict_labels(
+    X: np.ndarray,
+    result: Optional[DivikResult],
+    reverse_paths: Dict[Tuple[int, ...], int],
+) -> np.ndarray:
+    """Route all the observations through the tree, level by level
+
+    Each node predicts the whole subset of observations that reached it and
+    partitions it among its subregions, so the leaf labels are assigned to
+    whole subsets at once.
+    """
+    labels = np.empty((X.shape[0],), dtype=np.int32)
+    level = [((), np.arange(X.shape[0]), result)]
+    while level:
+        next_level = []
+        for path, indices, division in level:
+            if division is None:
+                labels[indices] = reverse_paths[path or (0,)]
+                continue
+            columns = division.feature_selector.get_support(indices=True)
+            local_X = _gather(X, indices, columns)
+            predicted = np.asarray(division.clustering.predict(local_X)).ravel()
+            for label, subregion in enumerate(division.subregions):
+                selected = indices[predicted == label]
+                if selected.size:
+                    next_level.append((path + (label,), selected, subregion))
+        level = next_level
+    return labels
 
 
 def make_merged(result: Optional[DivikResult]) -> np.ndarray:
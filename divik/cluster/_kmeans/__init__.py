@@ -7,3 +7,4 @@ from ._core import (
 )
 from ._dunn import DunnSearch
 from ._gap import GAPSearch
+from ._variance_ratio import VarianceRatioSearch
@@ -0,0 +1,213 @@
+"""Triangle inequality accelerated k-means iterations
+
+Both algorithms keep bounds on the distances between observations and
+centroids, which allows to skip most of the distance evaluations once
+the clustering approaches convergence. They are exact, i.e. they yield
+the same partition as Lloyd's algorithm, but require the distance to be
+a metric.
+
+References
+----------
+Elkan, C. (2003). Using the triangle inequality to accelerate k-means.
+ICML 2003.
+
+Hamerly, G. (2010). Making k-means even faster. SDM 2010.
+"""
+import logging
+from typing import Callable, Tuple
+
+import numpy as np
+import scipy.spatial.distance as dst
+
+from divik.core import Centroids, Data, IntLabels
+from divik.core._distance import pairwise
+
+Update = Callable[[IntLabels], Tuple[Centroids, np.ndarray]]
+Fix = Callable[[Centroids, IntLabels, np.ndarray], Tuple[Centroids, IntLabels]]
+
+
+def _own_distance(data: Data, centroids: Centroids, labels: IntLabels, distance, norms):
+    """Distance of each observation to its own centroid"""
+    result = np.empty((data.shape[0],))
+    for label in np.unique(labels):
+        rows = labels == label
+        result[rows] = pairwise(
+            data[rows], centroids[np.newaxis, label], distance, _subset(norms, rows)
+        ).ravel()
+    return result
+
+
+def _subset(norms, rows):
+    return None if norms is None else norms[rows]
+
+
+def _half_separation(centroids: Centroids, distance) -> Tuple[np.ndarray, np.ndarray]:
+    """Half of the inter-centroid distances and to the closest other centroid"""
+    half = 0.5 * dst.cdist(centroids, centroids, distance)
+    masked = half + np.diag(np.full(centroids.shape[0], np.inf))
+    return half, masked.min(axis=1)
+
+
+def _shift(old: Centroids, new: Centroids, distance) -> np.ndarray:
+    return np.diagonal(dst.cdist(old, new, distance)).copy()
+
+
+def elkan(
+    data: Data,
+    centroids: Centroids,
+    distance: str,
+    max_iter: int,
+    update: Update,
+    fix: Fix,
+    norms: np.ndarray = None,
+) -> Tuple[IntLabels, Centroids]:
+    """Run Elkan's k-means iterations
+
+    Keeps an upper bound of the distance to the own centroid and ``k`` lower
+    bounds of the distances to all the centroids for each observation.
+
+    @param data: observations in rows
+    @param centroids: initial centroids in rows
+    @param distance: metric distance supported by scipy
+    @param max_iter: maximal number of centroids updates
+    @param update: recomputes centroids for given labels
+    @param fix: restores the centroids of vanished labels
+    @param norms: precomputed ``row_norms`` of data
+    @return: labels and centroids
+    """
+    lower = pairwise(data, centroids, distance, norms)
+    labels = np.argmin(lower, axis=1)
+    rows = np.arange(data.shape[0])
+    upper = lower[rows, labels]
+    for _ in range(max_iter):
+        old = centroids
+        centroids, counts = update(labels)
+        if not np.all(counts):
+            centroids, labels = fix(centroids, labels, counts)
+            lower = pairwise(data, centroids, distance, norms)
+            upper = lower[rows, labels]
+        else:
+            shift = _shift(old, centroids, distance)
+            upper = upper + shift[labels]
+            lower = np.maximum(lower - shift, 0)
+
+        half, separation = _half_separation(centroids, distance)
+        candidates = np.flatnonzero(upper > separation[labels])
+        if candidates.size == 0:
+            logging.debug("Stability achieved.")
+            break
+        own = labels[candidates]
+        bound = upper[candidates, np.newaxis]
+        check = (bound > lower[candidates]) & (bound > half[own])
+        check[np.arange(candidates.size), own] = False
+        stale = check.any(axis=1)
+        candidates, own, check = candidates[stale], own[stale], check[stale]
+
+        tight = _own_distance(
+            data[candidates], centroids, own, distance, _subset(norms, candidates)
+        )
+        upper[candidates] = tight
+        lower[candidates, own] = tight
+        check &= (tight[:, np.newaxis] > lower[candidates]) & (
+            tight[:, np.newaxis] > half[own]
+        )
+        for label in np.flatnonzero(check.any(axis=0)):
+            selected = candidates[check[:, label]]
+            lower[selected, label] = pairwise(
+                data[selected],
+                centroids[np.newaxis, label],
+                distance,
+                _subset(norms, selected),
+            ).ravel()
+
+        closest = np.where(check, lower[candidates], np.inf)
+        closest[np.arange(candidates.size), own] = tight
+        new_own = np.argmin(closest, axis=1)
+        changed = new_own != own
+        if not changed.any():
+            logging.debug("Stability achieved.")
+            break
+        moved = candidates[changed]
+        labels = labels.copy()
+        labels[moved] = new_own[changed]
+        upper[moved] = lower[moved, labels[moved]]
+    return labels, centroids
+
+
+def hamerly(
+    data: Data,
+    centroids: Centroids,
+    distance: str,
+    max_iter: int,
+    update: Update,
+    fix: Fix,
+    norms: np.ndarray = None,
+) -> Tuple[IntLabels, Centroids]:
+    """Run Hamerly's k-means iterations
+
+    Keeps an upper bound of the distance to the own centroid and a single
+    lower bound of the distance to the second closest centroid for each
+    observation. Uses less memory than Elkan's variant, so it is preferred
+    for a small number of clusters.
+
+    @param data: observations in rows
+    @param centroids: initial centroids in rows
+    @param distance: metric distance supported by scipy
+    @param max_iter: maximal number of centroids updates
+    @param update: recomputes centroids for given labels
+    @param fix: restores the centroids of vanished labels
+    @param norms: precomputed ``row_norms`` of data
+    @return: labels and centroids
+    """
+    rows = np.arange(data.shape[0])
+
+    def bounds(selected):
+        distances = pairwise(
+            data[selected], centroids, distance, _subset(norms, selected)
+        )
+        closest = np.argmin(distances, axis=1)
+        local = np.arange(closest.size)
+        first = distances[local, closest]
+        distances[local, closest] = np.inf
+        return closest, first, distances.min(axis=1)
+
+    labels, upper, lower = bounds(rows)
+    for _ in range(max_iter):
+        old = centroids
+        centroids, counts = update(labels)
+        if not np.all(counts):
+            centroids, labels = fix(centroids, labels, counts)
+            distances = pairwise(data, centroids, distance, norms)
+            upper = distances[rows, labels]
+            distances[rows, labels] = np.inf
+            lower = distances.min(axis=1)
+        else:
+            shift = _shift(old, centroids, distance)
+            order = np.argsort(shift)
+            largest, second = shift[order[-1]], shift[order[-2]]
+            upper = upper + shift[labels]
+            lower = lower - np.where(labels == order[-1], second, largest)
+
+        _, separation = _half_separation(centroids, distance)
+        bound = np.maximum(separation[labels], lower)
+        candidates = np.flatnonzero(upper > bound)
+        tight = _own_distance(
+            data[candidates],
+            centroids,
+            labels[candidates],
+            distance,
+            _subset(norms, candidates),
+        )
+        upper[candidates] = tight
+        candidates = candidates[tight > bound[candidates]]
+        if candidates.size == 0:
+            logging.debug("Stability achieved.")
+            break
+        new_own, upper[candidates], lower[candidates] = bounds(candidates)
+        changed = new_own != labels[candidates]
+        if not changed.any():
+            logging.debug("Stability achieved.")
+            break
+        labels = labels.copy()
+        labels[candidates] = new_own
+    return labels, centroids
@@ -0,0 +1,120 @@
+"""Lloyd's iterations over a stack of independent problems
+
+Problems of the same shape, like reference data sets of the GAP
+statistic, are clustered together. Distances to the centroids and the
+centroid updates are computed for all of them in single calls, so many
+small problems do not pay the dispatch overhead each. Problems that
+converge drop out of the stack.
+"""
+from typing import Callable, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from divik.core import Centroids, Data, IntLabels, float_dtype
+from divik.core._distance import _prepare_centroids, row_norms
+
+Fix = Callable[[int, Centroids, IntLabels, np.ndarray], Tuple[Centroids, IntLabels]]
+
+
+def _flat(stack: np.ndarray) -> np.ndarray:
+    return stack.reshape(-1, stack.shape[-1])
+
+
+def stacked_norms(data: Data, distance: str) -> np.ndarray:
+    """``row_norms`` of each problem in the stack"""
+    return row_norms(_flat(data), distance).reshape(data.shape[:2])
+
+
+def stacked_closest(
+    data: Data, norms: np.ndarray, centroids: Centroids, distance: str
+) -> IntLabels:
+    """Labels of the closest centroids for each problem in the stack
+
+    @param data: observations of each problem, (n_problems, n_rows, n_cols)
+    @param norms: ``stacked_norms`` of data
+    @param centroids: centroids of each problem, (n_problems, k, n_cols)
+    @param distance: distance metric supported by ``pairwise`` GEMM kernels
+    @return: labels, (n_problems, n_rows)
+    """
+    prepared, c_norms = _prepare_centroids(
+        _flat(centroids), distance, float_dtype(data)
+    )
+    prepared = prepared.reshape(centroids.shape)
+    if distance in ("euclidean", "sqeuclidean"):
+        data = data.astype(np.float64, copy=False)
+    products = np.matmul(data, prepared.transpose(0, 2, 1))
+    products = products.astype(np.float64, copy=False)
+    if distance in ("euclidean", "sqeuclidean"):
+        products *= -2
+        products += norms[:, :, np.newaxis]
+        products += c_norms.reshape(centroids.shape[0], 1, centroids.shape[1])
+        np.maximum(products, 0, out=products)
+        if distance == "euclidean":
+            np.sqrt(products, out=products)
+    else:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            products /= norms[:, :, np.newaxis]
+        np.subtract(1, products, out=products)
+    return np.argmin(products, axis=2)
+
+
+def stacked_centroids(
+    data: Data, labels: IntLabels, n_clusters: int
+) -> Tuple[Centroids, np.ndarray]:
+    """Recompute centroids of each problem in the stack at once
+
+    @param data: observations of each problem, (n_problems, n_rows, n_cols)
+    @param labels: labels of each problem, (n_problems, n_rows)
+    @param n_clusters: number of clusters in each problem
+    @return: centroids (NaN for empty clusters) and sizes of the clusters
+    """
+    n_problems, n_rows, n_cols = data.shape
+    # each problem has its own block of rows in the indicator matrix
+    groups = labels + n_clusters * np.arange(n_problems)[:, np.newaxis]
+    indicator = sparse.csr_matrix(
+        (np.ones(groups.size), (groups.ravel(), np.arange(groups.size))),
+        shape=(n_problems * n_clusters, groups.size),
+    )
+    sums = indicator @ _flat(data)
+    counts = np.bincount(groups.ravel(), minlength=n_problems * n_clusters)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centroids = (sums / counts[:, np.newaxis]).astype(float_dtype(data))
+    shape = n_problems, n_clusters
+    return centroids.reshape(shape + (n_cols,)), counts.reshape(shape)
+
+
+def lloyd(
+    data: Data, centroids: Centroids, distance: str, max_iter: int, fix: Fix
+) -> Tuple[IntLabels, Centroids]:
+    """Lloyd's k-means iterations for each problem in the stack
+
+    @param data: observations of each problem, (n_problems, n_rows, n_cols)
+    @param centroids: initial centroids, (n_problems, k, n_cols)
+    @param distance: distance metric supported by ``pairwise`` GEMM kernels
+    @param max_iter: maximal number of iterations
+    @param fix: recovery of empty clusters of a single problem, given its
+    index, centroids, labels and sizes of the clusters
+    @return: labels and centroids of each problem
+    """
+    centroids = centroids.copy()
+    norms = stacked_norms(data, distance)
+    labels = stacked_closest(data, norms, centroids, distance)
+    old_labels = np.full(labels.shape, -1)
+    n_clusters = centroids.shape[1]
+    for _ in range(max_iter):
+        active = np.flatnonzero(np.any(labels != old_labels, axis=1))
+        if active.size == 0:
+            break
+        old_labels[active] = labels[active]
+        updated, counts = stacked_centroids(
+            data[active], old_labels[active], n_clusters
+        )
+        for i, problem in enumerate(active):
+            if not np.all(counts[i]):
+                updated[i], old_labels[problem] = fix(
+                    problem, updated[i], old_labels[problem], counts[i]
+                )
+        centroids[active] = updated
+        labels[active] = stacked_closest(data[active], norms[active], updated, distance)
+    return labels, centroids
@@ -1,4 +1,8 @@
 import logging
+import time
+import uuid
+from functools import partial
+from itertools import cycle
 from typing import Tuple, Union
 
 import dask.array as da
@@ -6,19 +10,26 @@ import dask.dataframe as dd
 import dask_distance as ddst
 import numpy as np
 import scipy.spatial.distance as dst
+from scipy import sparse
 from sklearn.base import (
     BaseEstimator,
     ClusterMixin,
     TransformerMixin,
+    clone,
 )
 from sklearn.utils.validation import check_is_fitted
 
+from divik.cluster._kmeans import _batched
+from divik.cluster._kmeans._accelerated import elkan, hamerly
 from divik.cluster._kmeans._initialization import (
     ExtremeInitialization,
     Initialization,
     KDTreeInitialization,
     KDTreePercentileInitialization,
     PercentileInitialization,
+    PrecomputedInitialization,
+    ScalableInitialization,
+    SubsampledInitialization,
 )
 from divik.core import (
     Centroids,
@@ -26,26 +37,54 @@ from divik.core import (
     IntLabels,
     SegmentationMethod,
     configurable,
+    float_dtype,
+    maybe_pool,
     normalize_rows,
+    share,
 )
+from divik.core._distance import (
+    BLOCK_BYTES,
+    GEMM_DISTANCES,
+    METRICS,
+    block_rows,
+    closest,
+    pairwise,
+    row_norms,
+)
+
+_DATA = {}
+
+
+def _pool_initialize(ref, data):
+    _DATA[ref] = data
 
 
 class Labeling(object):
     """Labels observations by closest centroids"""
 
-    def __init__(self, distance_metric: str, allow_dask: bool = False):
+    def __init__(
+        self,
+        distance_metric: str,
+        allow_dask: bool = False,
+        max_bytes: int = BLOCK_BYTES,
+    ):
         """
         @param distance_metric: distance metric for estimation of closest
         @param allow_dask: should be False if `multiprocessing.Pool` is spawned
+        @param max_bytes: memory budget for a block of distances matrix
         """
         self.distance_metric = distance_metric
         self.allow_dask = allow_dask
+        self.max_bytes = max_bytes
 
-    def __call__(self, data: Data, centroids: Centroids) -> IntLabels:
+    def __call__(
+        self, data: Data, centroids: Centroids, norms: np.ndarray = None
+    ) -> IntLabels:
         """Find closest centroids
 
         @param data: observations in rows
         @param centroids: centroids in rows
+        @param norms: precomputed ``row_norms`` of data
         @return: vector of labels of centroids closest to points
         """
         if data.shape[1] != centroids.shape[1]:
@@ -62,21 +101,53 @@ class Labeling(object):
             distances = ddst.cdist(X1, X2, self.distance_metric)
             labels = da.argmin(distances, axis=1).compute()
         else:
-            distances = dst.cdist(data, centroids, self.distance_metric)
-            labels = np.argmin(distances, axis=1)
+            labels, _ = closest(
+                data, centroids, self.distance_metric, self.max_bytes, norms
+            )
         return labels
 
 
+def _cluster_sums(data: Data, labeling: IntLabels, n_clusters: int) -> np.ndarray:
+    """Sum observations within clusters, accumulating in double precision"""
+    dtype = float_dtype(data)
+    if dtype == np.float64:
+        step = data.shape[0]
+    else:
+        # partial sums stay in the precision of data, while the totals are
+        # accumulated in double precision without copying the whole data
+        step = block_rows(data.shape[1])
+    sums = np.zeros((n_clusters, data.shape[1]))
+    for start in range(0, data.shape[0], step):
+        labels = labeling[start : start + step]
+        indicator = sparse.csr_matrix(
+            (np.ones(labels.size, dtype=dtype), (labels, np.arange(labels.size))),
+            shape=(n_clusters, labels.size),
+        )
+        sums += indicator @ data[start : start + step]
+    return sums
+
+
 def redefine_centroids(
-    data: Data, labeling: IntLabels, label_set: IntLabels, allow_dask: bool = False
-) -> Centroids:
+    data: Data,
+    labeling: IntLabels,
+    label_set: IntLabels,
+    allow_dask: bool = False,
+    out: Centroids = None,
+    return_counts: bool = False,
+) -> Union[Centroids, Tuple[Centroids, np.ndarray]]:
     """Recompute centroids in data for given labeling
 
+    Centroids are computed in a single pass over the data and have the
+    floating point type of the data. Centroids of empty clusters are filled
+    with NaNs.
+
     @param data: observations
     @param labeling: partition of dataset into groups
     @param label_set: set of labels used for partitioning
     @param allow_dask: should be False if `multiprocessing.Pool` is spawned
-    @return: centroids
+    @param out: preallocated buffer for the centroids, reused across calls
+    @param return_counts: if True, returns also sizes of the clusters
+    @return: centroids and optionally sizes of the clusters
     """
     if data.shape[0] != labeling.size:
         msg = (
@@ -86,15 +157,51 @@ def redefine_centroids(
         )
         logging.error(msg)
         raise ValueError(msg)
+    n_clusters = len(label_set)
+    if out is None:
+        out = np.empty((n_clusters, data.shape[1]), dtype=float_dtype(data))
+    counts = np.bincount(labeling, minlength=n_clusters)
     if allow_dask and (data.shape[0] > 10000 or data.shape[1] > 1000):
         X = dd.from_array(data)
         y = dd.from_array(labeling)
-        centroids = X.groupby(y).mean().compute().values
+        means = X.groupby(y).mean().compute().sort_index()
+        out[means.index.values] = means.values
+        out[counts == 0] = np.nan
     else:
-        centroids = np.nan * np.zeros((len(label_set), data.shape[1]))
-        for label in label_set:
-            centroids[label] = np.mean(data[labeling == label], axis=0)
-    return centroids
+        sums = _cluster_sums(data, labeling, n_clusters)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            np.divide(sums, counts[:, np.newaxis], out=out)
+    if return_counts:
+        return out, counts
+    return out
+
+
+def minibatch_update(
+    batch: Data, centroids: Centroids, counts: np.ndarray, distance: str
+) -> IntLabels:
+    """Move centroids towards the observations of a mini-batch
+
+    Each centroid is moved with a learning rate equal to the inverse of the
+    number of observations assigned to it so far, so it remains a running
+    mean of its members.
+
+    @param batch: observations in rows
+    @param centroids: centroids in rows, updated in place
+    @param counts: number of observations assigned to each centroid so far,
+    updated in place
+    @param distance: distance metric supported by scipy
+    @return: labels of observations in the batch
+    """
+    labels, _ = closest(batch, centroids, distance)
+    label_set = np.arange(centroids.shape[0])
+    means, batch_counts = redefine_centroids(
+        batch, labels, label_set, return_counts=True
+    )
+    counts += batch_counts
+    seen = batch_counts > 0
+    rate = batch_counts[seen] / counts[seen]
+    centroids[seen] += rate[:, np.newaxis] * (means[seen] - centroids[seen])
+    return labels
 
 
 def _validate_kmeans_input(data: Data, number_of_clusters: int):
@@ -126,6 +233,7 @@ class _KMeans(SegmentationMethod):
         number_of_iterations: int = 100,
         normalize_rows: bool = False,
         allow_dask: bool = False,
+        algorithm: str = "lloyd",
     ):
         """
         @param labeling: labeling method
@@ -133,38 +241,54 @@ class _KMeans(SegmentationMethod):
         @param number_of_iterations: number of iterations
         @param normalize_rows: sets mean of row to 0 and norm to 1
         @param allow_dask: should be False if `multiprocessing.Pool` is spawned
+        @param algorithm: iterations variant, one of 'lloyd', 'elkan', 'hamerly'
         """
         self.labeling = labeling
         self.initialize = initialize
         self.number_of_iterations = number_of_iterations
         self.normalize_rows = normalize_rows
         self.allow_dask = allow_dask
+        self.algorithm = algorithm
 
-    def _fix_labels(self, data, centroids, labels, n_clusters, retries=10):
+    def _fix_labels(
+        self, data, centroids, labels, n_clusters, counts, norms=None, retries=10
+    ):
         logging.debug("A label vanished - fixing")
         new_labels = labels.copy()
-        known_labels = np.unique(labels)
-        expected_labels = np.arange(n_clusters)
-        missing_labels = np.setdiff1d(expected_labels, known_labels)
+        known_labels = np.flatnonzero(counts)
+        missing_labels = np.flatnonzero(counts == 0)
         logging.debug(
             "Missing labels ({0} were expected): {1}".format(n_clusters, missing_labels)
         )
-        new_centroids = np.nan * np.zeros((n_clusters, centroids.shape[1]))
+        new_centroids = np.full(
+            (n_clusters, centroids.shape[1]), np.nan, dtype=centroids.dtype
+        )
         for known in known_labels:
             new_centroids[known] = centroids[known]
         for missing in missing_labels:
             logging.debug("Fixing label: {0}".format(missing))
-            new_center = np.nanmin(
-                dst.cdist(data, new_centroids, metric=self.labeling.distance_metric),
-                axis=1,
-            ).argmax()
+            assigned = np.logical_not(np.isnan(new_centroids).any(axis=1))
+            _, distances = closest(
+                data,
+                new_centroids[assigned],
+                self.labeling.distance_metric,
+                norms=norms,
+            )
+            new_center = distances.argmax()
             logging.debug("Assigning to label: {0}".format(labels[new_center]))
             new_labels[new_center] = missing
             new_centroids[missing] = data[new_center]
-        if np.unique(new_labels).size != n_clusters and retries > 0:
-            logging.debug("fixed but lost another: {0}".format(np.unique(new_labels)))
+        new_counts = np.bincount(new_labels, minlength=n_clusters)
+        if not new_counts.all() and retries > 0:
+            logging.debug("fixed but lost another: {0}".format(new_counts))
             return self._fix_labels(
-                data, new_centroids, new_labels, n_clusters, retries - 1
+                data,
+                new_centroids,
+                new_labels,
+                n_clusters,
+                new_counts,
+                norms,
+                retries - 1,
             )
         return new_centroids, new_labels
 
@@ -175,39 +299,108 @@ class _KMeans(SegmentationMethod):
         if number_of_clusters == 1:
             return (
                 np.zeros((data.shape[0], 1), dtype=int),
-                np.mean(data, axis=0, keepdims=True),
+                np.mean(data, axis=0, keepdims=True, dtype=np.float64).astype(
+                    float_dtype(data)
+                ),
             )
         data = data.reshape(data.shape, order="C")
         if self.normalize_rows:
             _validate_normalizable(data)
             data = normalize_rows(data)
         label_set = np.arange(number_of_clusters)
+        norms = row_norms(data, self.labeling.distance_metric)
         logging.debug("Initializing KMeans centroids.")
-        centroids = self.initialize(data, number_of_clusters)
+        centroids = self.initialize(data, number_of_clusters, norms=norms)
         logging.debug("First centroids found.")
+        if self.algorithm != "lloyd":
+            return self._accelerated(data, centroids, label_set, norms)
         old_labels = np.nan * np.zeros((data.shape[0],))
-        labels = self.labeling(data, centroids)
+        labels = self.labeling(data, centroids, norms=norms)
         logging.debug("Labels assigned.")
+        buffer = np.empty((number_of_clusters, data.shape[1]), dtype=centroids.dtype)
         for _ in range(self.number_of_iterations):
-            if np.unique(labels).size != number_of_clusters:
-                centroids, labels = self._fix_labels(
-                    data, centroids, labels, number_of_clusters
-                )
             if np.all(labels == old_labels):
                 logging.debug("Stability achieved.")
                 break
             old_labels = labels
-            centroids = redefine_centroids(data, old_labels, label_set, self.allow_dask)
-            labels = self.labeling(data, centroids)
+            centroids, counts = redefine_centroids(
+                data,
+                old_labels,
+                label_set,
+                self.allow_dask,
+                out=buffer,
+                return_counts=True,
+            )
+            if not np.all(counts):
+                centroids, old_labels = self._fix_labels(
+                    data, centroids, old_labels, number_of_clusters, counts, norms
+                )
+            labels = self.labeling(data, centroids, norms=norms)
         return labels, centroids
 
+    def _accelerated(
+        self, data: Data, centroids: Centroids, label_set: IntLabels, norms
+    ):
+        iterate = _ALGORITHMS[self.algorithm]
+        # bounds update requires both, old and new centroids
+        buffers = cycle([np.empty_like(centroids), np.empty_like(centroids)])
+
+        def update(labels):
+            return redefine_centroids(
+                data,
+                labels,
+                label_set,
+                self.allow_dask,
+                out=next(buffers),
+                return_counts=True,
+            )
+
+        def fix(centroids, labels, counts):
+            return self._fix_labels(
+                data, centroids, labels, label_set.size, counts, norms
+            )
+
+        return iterate(
+            data,
+            centroids,
+            distance=self.labeling.distance_metric,
+            max_iter=self.number_of_iterations,
+            update=update,
+            fix=fix,
+            norms=norms,
+        )
+
+
+_ALGORITHMS = {
+    "elkan": elkan,
+    "hamerly": hamerly,
+}
+
+
+def _validate_algorithm(algorithm: str, distance: str):
+    if algorithm != "lloyd" and algorithm not in _ALGORITHMS:
+        msg = f"Unknown algorithm: {algorithm}"
+        logging.error(msg)
+        raise ValueError(msg)
+    if algorithm != "lloyd" and distance not in METRICS:
+        msg = (
+            f"Algorithm {algorithm} requires a metric distance, "
+            + f"one of {list(METRICS)}. Was: {distance}"
+        )
+        logging.error(msg)
+        raise ValueError(msg)
+
 
 def _parse_initialization(
-    name: str,
+    name: Union[str, Centroids],
     distance: str,
     percentile: float = None,
     leaf_size: Union[int, float] = 0.01,
+    n_jobs: int = 1,
+    seed: int = 0,
 ) -> Initialization:
+    if not isinstance(name, str):
+        return PrecomputedInitialization(name)
     if name == "percentile":
         return PercentileInitialization(distance, percentile)
     if name == "extreme":
@@ -216,6 +409,8 @@ def _parse_initialization(
         return KDTreeInitialization(distance, leaf_size)
     if name == "kdtree_percentile":
         return KDTreePercentileInitialization(distance, leaf_size, percentile)
+    if name == "kmeans||":
+        return ScalableInitialization(distance, n_jobs=n_jobs, seed=seed)
     logging.error("Unknown initialization: {0}".format(name))
     raise ValueError("Unknown initialization: {0}".format(name))
 
@@ -234,7 +429,8 @@ class KMeans(BaseEstimator, ClusterMixin, TransformerMixin):
     distance : str, optional, default: 'euclidean'
         Distance measure. One of the distances supported by scipy package.
 
-    init : {'percentile', 'extreme', 'kdtree', 'kdtree_percentile'}
+    init : {'percentile', 'extreme', 'kdtree', 'kdtree_percentile', \
+            'kmeans||'} or array
         Method for initialization, defaults to 'percentile':
 
         'percentile' : selects initial cluster centers for k-mean
@@ -252,6 +448,16 @@ class KMeans(BaseEstimator, ClusterMixin, TransformerMixin):
         clustering starting from centroids of KD-Tree boxes containing
         specified percentile. This should be more robust against outliers.
 
+        'kmeans||': selects initial cluster centers with k-means|| algorithm.
+        It samples candidates in 5 rounds, each over a single pass through
+        the data, and reclusters the candidates weighted by the number of
+        observations closest to them. Passes are split across ``n_jobs``
+        workers. Randomized with ``seed``.
+
+        If an array of shape (n_centroids, n_features) is passed, its first
+        ``n_clusters`` rows are used as the initial centroids. With
+        ``normalize_rows`` these must be in the space of normalized rows.
+
     percentile : float, default: 95.0
         Specifies the starting percentile for 'percentile' initialization.
         Must be within range [0.0, 100.0]. At 100.0 it is equivalent to
@@ -264,7 +470,16 @@ class KMeans(BaseEstimator, ClusterMixin, TransformerMixin):
 
     max_iter : int, default: 100
         Maximum number of iterations of the k-means algorithm for a
-        single run.
+        single run. With ``batch_size`` it is the maximal number of passes
+        over the data.
+
+    algorithm : {'lloyd', 'elkan', 'hamerly'}, default: 'lloyd'
+        K-means algorithm variant. 'elkan' and 'hamerly' use the triangle
+        inequality to skip most of the distance computations and provide the
+        same results as 'lloyd'. They require metric ``distance``, i.e. one of
+        'euclidean', 'cityblock', 'chebyshev' or 'minkowski'. 'elkan' keeps
+        ``n_samples * n_clusters`` bounds, while 'hamerly' only two per sample,
+        so it is preferred for small ``n_clusters``.
 
     normalize_rows : bool, default: False
         If True, rows are translated to mean of 0.0 and scaled to norm of 1.0.
@@ -274,6 +489,28 @@ class KMeans(BaseEstimator, ClusterMixin, TransformerMixin):
         reasonable. Default `False` since it cannot be used together with
         `multiprocessing.Pool` and everywhere `n_jobs` must be set to `1`.
 
+    batch_size : int, optional, default: None
+        If set, centroids are updated with consecutive mini-batches of that
+        size instead of full passes over the data. Initialization is then
+        computed from a strided sample of ``batch_size`` observations.
+        This also sets the size of the mini-batches in ``partial_fit``.
+
+    n_init : int, default: 1
+        Number of k-means runs. The first run starts from the ``init``
+        centroids, the following ones from ``init`` applied to random halves
+        of the data ('kmeans||' is reseeded instead, precomputed centroids
+        are replaced with reseeded 'kmeans||'). The run with the lowest
+        inertia is kept. Ignored with ``batch_size``.
+
+    n_jobs : int, default: 1
+        The number of jobs running the ``n_init`` runs concurrently over a
+        single shared copy of the data. With a single run, the jobs compute
+        the 'kmeans||' initialization.
+
+    seed : int, default: 0
+        Random seed for the subsets drawn by the runs beyond the first one
+        and for the 'kmeans||' initialization.
+
     Attributes
     ----------
 
@@ -281,7 +518,18 @@ class KMeans(BaseEstimator, ClusterMixin, TransformerMixin):
         Coordinates of cluster centers.
 
     labels_ :
-        Labels of each point
+        Labels of each point. After ``partial_fit`` these are the labels of
+        the last chunk.
+
+    counts_ : array, [n_clusters,]
+        Number of observations assigned to each cluster. After
+        ``partial_fit`` these are the sizes within the last chunk.
+
+    inertia_ : float
+        Sum of squared distances of samples to their closest cluster center.
+
+    restart_times_ : array, [n_init,]
+        Duration of each of the k-means runs in seconds.
 
     """
 
@@ -290,12 +538,17 @@ class KMeans(BaseEstimator, ClusterMixin, TransformerMixin):
         self,
         n_clusters: int,
         distance: str = "euclidean",
-        init: str = "percentile",
+        init: Union[str, Centroids] = "percentile",
         percentile: float = 95.0,
         leaf_size: Union[int, float] = 0.01,
         max_iter: int = 100,
         normalize_rows: bool = False,
         allow_dask: bool = False,
+        algorithm: str = "lloyd",
+        batch_size: int = None,
+        n_init: int = 1,
+        n_jobs: int = 1,
+        seed: int = 0,
     ):
         super().__init__()
         self.n_clusters = n_clusters
@@ -306,6 +559,11 @@ class KMeans(BaseEstimator, ClusterMixin, TransformerMixin):
         self.max_iter = max_iter
         self.normalize_rows = normalize_rows
         self.allow_dask = allow_dask
+        self.algorithm = algorithm
+        self.batch_size = batch_size
+        self.n_init = n_init
+        self.n_jobs = n_jobs
+        self.seed = seed
 
     def fit(self, X, y=None):
         """Compute k-means clustering.
@@ -321,21 +579,225 @@ class KMeans(BaseEstimator, ClusterMixin, TransformerMixin):
         y : Ignored
             not used, present here for API consistency by convention.
         """
+        if self.batch_size is not None:
+            return self._fit_minibatch(np.asanyarray(X))
+        _validate_algorithm(self.algorithm, self.distance)
+        X = self._prepare(X)
+        if self.n_init == 1:
+            runs = [self._run(0, X)]
+        else:
+            ref = str(uuid.uuid4())
+            with share(X) as x:
+                _DATA[ref] = x
+                with maybe_pool(
+                    self.n_jobs, initializer=_pool_initialize, initargs=(ref, x)
+                ) as pool:
+                    run = partial(self._shared_run, data_ref=ref)
+                    runs = pool.map(run, range(self.n_init))
+                del _DATA[ref]
+        labels, centroids, inertia, _ = min(runs, key=lambda r: r[2])
+        self.labels_ = labels
+        self.cluster_centers_ = centroids
+        self.inertia_ = inertia
+        self.restart_times_ = np.array([r[3] for r in runs])
+        self.counts_ = np.bincount(self.labels_, minlength=self.n_clusters)
+        self._weights = self.counts_.copy()  # partial_fit continues from here
+        return self
+
+    def _run(self, run: int, X):
+        start = time.perf_counter()
+        # nested pools are not allowed, restarts already run in parallel
+        n_jobs = self.n_jobs if self.n_init == 1 else 1
         initialize = _parse_initialization(
-            self.init, self.distance, self.percentile, self.leaf_size
+            self.init,
+            self.distance,
+            self.percentile,
+            self.leaf_size,
+            n_jobs=n_jobs,
+            seed=self.seed + run,
         )
+        if run > 0 and isinstance(initialize, PrecomputedInitialization):
+            # precomputed centroids do not depend on the data they are drawn from
+            initialize = ScalableInitialization(
+                self.distance, n_jobs=n_jobs, seed=self.seed + run
+            )
+        elif run > 0 and not isinstance(initialize, ScalableInitialization):
+            initialize = SubsampledInitialization(initialize, seed=self.seed + run)
         kmeans = _KMeans(
             labeling=Labeling(self.distance, allow_dask=self.allow_dask),
             initialize=initialize,
             number_of_iterations=self.max_iter,
-            normalize_rows=self.normalize_rows,
+            normalize_rows=False,  # rows normalized once by _prepare
             allow_dask=self.allow_dask,
+            algorithm=self.algorithm,
         )
+        labels, centroids = kmeans(X, number_of_clusters=self.n_clusters)
+        _, distances = closest(X, centroids, self.distance)
+        inertia = float(np.sum(distances ** 2))
+        return labels.ravel(), centroids, inertia, time.perf_counter() - start
+
+    def _batchable(self) -> bool:
+        return (
+            self.algorithm == "lloyd"
+            and self.distance in GEMM_DISTANCES
+            and self.batch_size is None
+            and self.n_init == 1
+            and not self.allow_dask
+        )
+
+    def fit_predict_many(self, X) -> IntLabels:
+        """Cluster each of the stacked data sets independently.
+
+        Gives the same labels as ``fit_predict`` applied to each data set,
+        but the k-means iterations of all of them are computed together.
+        Configurations without such a path, i.e. other than 'lloyd'
+        ``algorithm`` with one of the euclidean, cosine or correlation
+        distances and a single run, fit the data sets one by one. The
+        estimator itself is not fit.
+
+        Parameters
+        ----------
+
+        X : array-like, shape=(n_sets, n_samples, n_features)
+            Data sets to cluster.
+
+        Returns
+        -------
+
+        labels : array, shape [n_sets, n_samples]
+            Index of the cluster each sample belongs to, for each data set.
+        """
         X = np.asanyarray(X)
-        self.labels_, self.cluster_centers_ = kmeans(
-            X, number_of_clusters=self.n_clusters
+        if not self._batchable():
+            return np.stack([clone(self).fit_predict(data) for data in X])
+        X = np.stack([self._prepare(data) for data in X])
+        initialize = _parse_initialization(
+            self.init, self.distance, self.percentile, self.leaf_size, seed=self.seed
         )
-        self.labels_ = self.labels_.ravel()
+        kmeans = _KMeans(
+            labeling=Labeling(self.distance),
+            initialize=initialize,
+            number_of_iterations=self.max_iter,
+        )
+        norms = _batched.stacked_norms(X, self.distance)
+        centroids = np.stack(
+            [
+                initialize(data, self.n_clusters, norms=data_norms)
+                for data, data_norms in zip(X, norms)
+            ]
+        )
+
+        def fix(offset, problem, centroids, labels, counts):
+            data, data_norms = X[offset + problem], norms[offset + problem]
+            return kmeans._fix_labels(
+                data, centroids, labels, self.n_clusters, counts, data_norms
+            )
+
+        # distances of a group of data sets fit within a single block
+        n_distances = X.shape[1] * self.n_clusters
+        step = max(BLOCK_BYTES // (8 * n_distances), 1)
+        labels = np.empty(X.shape[:2], dtype=np.intp)
+        for start in range(0, X.shape[0], step):
+            labels[start : start + step], _ = _batched.lloyd(
+                X[start : start + step],
+                centroids[start : start + step],
+                self.distance,
+                self.max_iter,
+                partial(fix, start),
+            )
+        return labels
+
+    def _shared_run(self, run: int, data_ref):
+        return self._run(run, _DATA[data_ref].value)
+
+    def _seeds(self, X, n_clusters: int) -> Centroids:
+        """Initial centroids for fits with up to ``n_clusters`` clusters"""
+        X = np.asanyarray(X)
+        if self.normalize_rows:
+            _validate_normalizable(X)
+            X = normalize_rows(X)
+        initialize = _parse_initialization(
+            self.init,
+            self.distance,
+            self.percentile,
+            self.leaf_size,
+            n_jobs=self.n_jobs,
+            seed=self.seed,
+        )
+        return initialize(X, n_clusters, norms=row_norms(X, self.distance))
+
+    def _prepare(self, X):
+        X = np.asanyarray(X)
+        _validate_kmeans_input(X, self.n_clusters)
+        if self.normalize_rows:
+            _validate_normalizable(X)
+            X = normalize_rows(X)
+        return X
+
+    def _initialize(self, X):
+        initialize = _parse_initialization(
+            self.init,
+            self.distance,
+            self.percentile,
+            self.leaf_size,
+            n_jobs=self.n_jobs,
+            seed=self.seed,
+        )
+        norms = row_norms(X, self.distance)
+        self.cluster_centers_ = initialize(X, self.n_clusters, norms=norms)
+        # observations seen by each centroid, the inverse learning rate of
+        # the mini-batch updates
+        self._weights = np.zeros((self.n_clusters,), dtype=int)
+
+    def _minibatch_pass(self, X):
+        labels = np.empty((X.shape[0],), dtype=np.intp)
+        batch_size = self.batch_size or X.shape[0]
+        for start in range(0, X.shape[0], batch_size):
+            batch = X[start : start + batch_size]
+            labels[start : start + batch_size] = minibatch_update(
+                batch, self.cluster_centers_, self._weights, self.distance
+            )
+        return labels
+
+    def _fit_minibatch(self, X):
+        start = time.perf_counter()
+        X = self._prepare(X)
+        stride = max(X.shape[0] // self.batch_size, 1)
+        self._initialize(X[::stride])
+        labels = None
+        for _ in range(self.max_iter):
+            previous, labels = labels, self._minibatch_pass(X)
+            if np.all(labels == previous):
+                logging.debug("Stability achieved.")
+                break
+        self.labels_, distances = closest(X, self.cluster_centers_, self.distance)
+        self.counts_ = np.bincount(self.labels_, minlength=self.n_clusters)
+        self.inertia_ = float(np.sum(distances ** 2))
+        self.restart_times_ = np.array([time.perf_counter() - start])
+        return self
+
+    def partial_fit(self, X, y=None):
+        """Update k-means clustering with a chunk of data.
+
+        The first call initializes the centroids from the chunk, so it must
+        contain at least ``n_clusters`` observations. Chunk is processed in
+        mini-batches of ``batch_size`` observations, or at once if
+        ``batch_size`` is None.
+
+        Parameters
+        ----------
+
+        X : array-like, shape=(n_samples, n_features)
+            Chunk of training instances to cluster.
+
+        y : Ignored
+            not used, present here for API consistency by convention.
+        """
+        X = self._prepare(X)
+        if not hasattr(self, "cluster_centers_"):
+            self._initialize(X)
+        self.labels_ = self._minibatch_pass(X)
+        self.counts_ = np.bincount(self.labels_, minlength=self.n_clusters)
         return self
 
     def predict(self, X):
@@ -360,7 +822,7 @@ class KMeans(BaseEstimator, ClusterMixin, TransformerMixin):
         check_is_fitted(self)
         if self.normalize_rows:
             X = normalize_rows(X)
-        labels = dst.cdist(X, self.cluster_centers_, self.distance).argmin(axis=1)
+        labels, _ = closest(X, self.cluster_centers_, self.distance)
         return labels
 
     def transform(self, X):
@@ -386,4 +848,4 @@ class KMeans(BaseEstimator, ClusterMixin, TransformerMixin):
         check_is_fitted(self)
         if self.normalize_rows:
             X = normalize_rows(X)
-        return dst.cdist(X, self.cluster_centers_, self.distance)
+        return pairwise(X, self.cluster_centers_, self.distance)
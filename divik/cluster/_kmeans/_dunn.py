@@ -15,18 +15,38 @@ from sklearn.utils.validation import check_is_fitted
 
 from divik.core import (
     configurable,
+    context_if,
     maybe_pool,
     share,
 )
-from divik.score import dunn, sampled_dunn
+from divik.score import cached_distances, dunn, sampled_dunn
+from divik.score._cache import adopt_distances, distance_matrix
 
 from ._core import KMeans
 
 _DATA = {}
 
 
-def _pool_initialize(ref, data):
+def _pool_initialize(ref, data, distances=None, distance=None, max_bytes=0):
     _DATA[ref] = data
+    if distances is not None:
+        adopt_distances(data.value, distance, distances.value, max_bytes)
+
+
+def _same_params(first, second) -> bool:
+    first, second = first.get_params(), second.get_params()
+    first.pop("n_clusters", None)
+    second.pop("n_clusters", None)
+    if first.keys() != second.keys():
+        return False
+    for name, value in first.items():
+        other = second[name]
+        if isinstance(value, np.ndarray) or isinstance(other, np.ndarray):
+            if not np.array_equal(value, other):
+                return False
+        elif value != other:
+            return False
+    return True
 
 
 @configurable
@@ -78,6 +98,41 @@ class DunnSearch(BaseEstimator, ClusterMixin, TransformerMixin):
     drop_unfit: bool, default: False
         If True, drops the estimators that did not fit the data.
 
+    sweep: {'independent', 'prefix', 'warm'}, default: 'independent'
+        How k-means is initialized for the consecutive numbers of clusters.
+        - independent - each k-means is initialized from scratch.
+        - prefix - initial centroids are computed once for `max_clusters` and
+        each k-means starts from the leading rows. Initializations are greedy,
+        so this gives the same results as `independent`, just faster. Falls
+        back to `independent` for 'kmeans||' initialization and for
+        `kmeans` with multiple restarts.
+        - warm - each k-means starts from the centroids found for one cluster
+        less, extended with the next initial centroid. Clusterings are
+        computed sequentially, only the scoring runs in parallel.
+        Both `prefix` and `warm` require `KMeans` from this package and fall
+        back to `independent` for other estimators. Fitted estimators keep
+        the `init` of `kmeans`.
+
+    distance_cache: int, default: 0
+        Memory budget in bytes for pairwise distances reused by the scoring
+        of all the numbers of clusters (see `divik.score.cached_distances`).
+        The matrix of the whole data is computed once and shared with the
+        jobs. Samples depend on the labels of each clustering, so sampled
+        scores are computed without the cache. 0 disables caching.
+
+    strategy: {'exhaustive', 'halving'}, default: 'exhaustive'
+        Which numbers of clusters are scored on the whole data.
+        - exhaustive - all of them.
+        - halving - successive halving. All the numbers of clusters are first
+        scored on a random sample of `halving_size` observations. The better
+        half is kept and scored on a twice larger sample, until a single
+        candidate is left or the sample would exceed the data. Only the
+        remaining candidates are scored on the whole data, with `sweep`
+        'warm' treated as 'prefix'.
+
+    halving_size: int, default: 1000
+        Size of the sample in the first round of `halving` strategy.
+
     verbose: bool, default: False
         If True, shows progress with tqdm.
 
@@ -90,11 +145,19 @@ class DunnSearch(BaseEstimator, ClusterMixin, TransformerMixin):
         Labels of each point.
 
     estimators_: List[KMeans]
-        KMeans instances for n_clusters in range [min_clusters, max_clusters].
+        KMeans instances for n_clusters in `evaluated_`.
 
-    scores_: array, [max_clusters - min_clusters + 1,]
+    scores_: array, [len(evaluated_),]
         Array with scores for each estimator.
 
+    evaluated_: array
+        Numbers of clusters scored on the whole data. With `exhaustive`
+        strategy, the whole range [min_clusters, max_clusters].
+
+    rounds_: List[Tuple[int, array, array]]
+        Sample size, numbers of clusters and their scores for each round of
+        `halving` strategy.
+
     n_clusters_: int
         Estimated optimal number of clusters.
 
@@ -120,6 +183,10 @@ class DunnSearch(BaseEstimator, ClusterMixin, TransformerMixin):
         n_jobs: int = 1,
         drop_unfit: bool = False,
         verbose: bool = False,
+        sweep: str = "independent",
+        distance_cache: int = 0,
+        strategy: str = "exhaustive",
+        halving_size: int = 1000,
     ):
         super().__init__()
         assert min_clusters <= max_clusters
@@ -135,6 +202,10 @@ class DunnSearch(BaseEstimator, ClusterMixin, TransformerMixin):
         self.n_jobs = n_jobs
         self.drop_unfit = drop_unfit
         self.verbose = verbose
+        self.sweep = sweep
+        self.distance_cache = distance_cache
+        self.strategy = strategy
+        self.halving_size = halving_size
 
     def _n_ops(self, data):
         if self.inter == "closest" or self.intra == "furthest":
@@ -157,6 +228,18 @@ class DunnSearch(BaseEstimator, ClusterMixin, TransformerMixin):
             n_trials=self.n_trials,
         )
 
+    def _distances(self, data):
+        """Distance matrix of the data if the scoring of every k reuses it"""
+        if self.distance_cache <= 0 or self.method == "sampled":
+            return None
+        if self.inter != "closest" and self.intra != "furthest":
+            return None
+        n_ops_full, n_ops_sampled = self._n_ops(data)
+        if self.method == "auto" and n_ops_full > n_ops_sampled:
+            return None
+        distance = getattr(self.kmeans, "distance", "euclidean")
+        return distance_matrix(data, distance)
+
     def _dunn(self, kmeans, data):
         n_ops_full, n_ops_sampled = self._n_ops(data)
         if self.method == "full":
@@ -175,15 +258,96 @@ class DunnSearch(BaseEstimator, ClusterMixin, TransformerMixin):
             raise ValueError(f"Unknown Dunn method {self.method}")
         return dunn_(kmeans, data, inter=self.inter, intra=self.intra)
 
-    def _fit_kmeans(self, n_clusters, data_ref):
-        data = _DATA[data_ref].value
+    def _make_kmeans(self, n_clusters, init=None):
         kmeans = clone(self.kmeans)
         kmeans.n_clusters = n_clusters
-        kmeans.fit(data)
+        if init is not None:
+            kmeans.init = init
+        return kmeans
+
+    def _fit_from(self, n_clusters, data, init=None):
+        kmeans = self._make_kmeans(n_clusters, init).fit(data)
+        # seeds of the sweep are not a part of the configuration
+        kmeans.init = self.kmeans.init
+        return kmeans
+
+    def _fit_kmeans(self, n_clusters, data_ref, seeds=None, rows=None):
+        data = _DATA[data_ref].value
+        if rows is not None:
+            data = data[rows]
+        init = None if seeds is None else seeds[:n_clusters]
+        kmeans = self._fit_from(n_clusters, data, init)
         d = self._dunn(kmeans, data)
         return kmeans, d
 
-    def fit(self, X, y=None):
+    def _score(self, kmeans, data_ref):
+        return kmeans, self._dunn(kmeans, _DATA[data_ref].value)
+
+    def _seeds(self, data):
+        init = self.kmeans.init
+        randomized = isinstance(init, str) and init == "kmeans||"
+        if self.sweep == "independent" or (self.sweep == "prefix" and randomized):
+            # k-means|| seeds for different k do not extend each other
+            return None
+        if self.sweep in ("prefix", "warm") and not hasattr(self.kmeans, "_seeds"):
+            logging.debug(f"Sweep {self.sweep} falls back to independent.")
+            return None
+        if self.sweep == "prefix" and getattr(self.kmeans, "n_init", 1) > 1:
+            # restarts draw their own initializations
+            return None
+        if self.sweep in ("prefix", "warm"):
+            return self.kmeans._seeds(data, self.max_clusters)
+        logging.error(f"Unknown sweep {self.sweep}.")
+        raise ValueError(f"Unknown sweep {self.sweep}")
+
+    def _halving(self, pool, n_clusters, data_ref, seeds, n_samples):
+        candidates = np.array(list(n_clusters))
+        sample_size = self.halving_size
+        random = np.random.RandomState(self.seed)
+        self.rounds_ = []
+        while candidates.size > 1 and sample_size < n_samples:
+            rows = np.sort(random.choice(n_samples, size=sample_size, replace=False))
+            fit_kmeans = partial(
+                self._fit_kmeans, data_ref=data_ref, seeds=seeds, rows=rows
+            )
+            scores = np.array([score for _, score in pool.map(fit_kmeans, candidates)])
+            logging.debug(f"Scores of {candidates} on {sample_size} rows: {scores}")
+            self.rounds_.append((sample_size, candidates, scores))
+            best = np.argsort(-scores, kind="stable")[: (candidates.size + 1) // 2]
+            candidates = np.sort(candidates[best])
+            sample_size *= 2
+        return candidates
+
+    def _reusable(self, fitted, n_samples):
+        """Fitted k-means with the configuration of this search, by k"""
+        if fitted is None:
+            return {}
+        reusable = {
+            kmeans.n_clusters: kmeans
+            for kmeans in fitted
+            if kmeans is not None
+            and kmeans.labels_.size == n_samples
+            and self.min_clusters <= kmeans.n_clusters <= self.max_clusters
+            and _same_params(kmeans, self.kmeans)
+        }
+        logging.debug(f"Reusing k-means fit for {sorted(reusable)} clusters.")
+        return reusable
+
+    def _warm_sweep(self, data, n_clusters, seeds, reusable=None):
+        estimators = []
+        init = seeds[: self.min_clusters]
+        # the first clustering starts from the same centroids as independent
+        reusable = reusable or {}
+        for k in n_clusters:
+            if k == self.min_clusters and k in reusable:
+                kmeans = reusable[k]
+            else:
+                kmeans = self._fit_from(k, data, init)
+            estimators.append(kmeans)
+            init = np.vstack([kmeans.cluster_centers_, seeds[k : k + 1]])
+        return estimators
+
+    def fit(self, X, y=None, fitted=None):
         """Compute k-means clustering and estimate optimal number of clusters.
 
         Parameters
@@ -197,26 +361,61 @@ class DunnSearch(BaseEstimator, ClusterMixin, TransformerMixin):
         y : Ignored
             not used, present here for API consistency by convention.
 
+        fitted : List[KMeans], optional
+            k-means already fit to X, e.g. during the stop condition check.
+            These with the configuration of `kmeans` are scored without
+            fitting them again.
+
         """
+        if self.strategy not in ("exhaustive", "halving"):
+            logging.error(f"Unknown strategy {self.strategy}.")
+            raise ValueError(f"Unknown strategy {self.strategy}")
         n_clusters = range(self.min_clusters, self.max_clusters + 1)
-        if self.verbose:
-            n_clusters = tqdm.tqdm(n_clusters, leave=False, file=sys.stdout)
+        reusable = self._reusable(fitted, X.shape[0])
+        self.rounds_ = []
         ref = str(uuid.uuid4())
-        with share(X) as x:
+        with context_if(
+            self.distance_cache > 0, cached_distances, self.distance_cache
+        ), share(X) as x:
             _DATA[ref] = x
-            with maybe_pool(
-                self.n_jobs, initializer=_pool_initialize, initargs=(ref, x)
+            seeds = self._seeds(x.value)
+            # computed once, before the workers that reuse it are started
+            matrix = self._distances(x.value)
+            distance = getattr(self.kmeans, "distance", "euclidean")
+            with context_if(matrix is not None, share, matrix) as distances, maybe_pool(
+                self.n_jobs,
+                initializer=_pool_initialize,
+                initargs=(ref, x, distances, distance, self.distance_cache),
             ) as pool:
-                fit_kmeans = partial(self._fit_kmeans, data_ref=ref)
-                kmeans_and_scores = pool.map(fit_kmeans, n_clusters)
+                warm = self.sweep == "warm" and seeds is not None
+                if self.strategy == "halving":
+                    n_samples = x.value.shape[0]
+                    n_clusters = self._halving(pool, n_clusters, ref, seeds, n_samples)
+                    warm = False
+                score = partial(self._score, data_ref=ref)
+                if warm:
+                    if self.verbose:
+                        n_clusters = tqdm.tqdm(n_clusters, leave=False, file=sys.stdout)
+                    estimators = self._warm_sweep(x.value, n_clusters, seeds, reusable)
+                    kmeans_and_scores = pool.map(score, estimators)
+                else:
+                    reused = [reusable[k] for k in n_clusters if k in reusable]
+                    missing = [k for k in n_clusters if k not in reusable]
+                    if self.verbose:
+                        missing = tqdm.tqdm(missing, leave=False, file=sys.stdout)
+                    fit_kmeans = partial(self._fit_kmeans, data_ref=ref, seeds=seeds)
+                    kmeans_and_scores = pool.map(fit_kmeans, missing)
+                    kmeans_and_scores += pool.map(score, reused)
+                    kmeans_and_scores.sort(key=lambda result: result[0].n_clusters)
             del _DATA[ref]
         logging.debug("Fitted DunnSearch")
 
         self.estimators_, self.scores_ = zip(*kmeans_and_scores)
         self.scores_ = np.array(self.scores_)
+        self.evaluated_ = np.array([e.n_clusters for e in self.estimators_])
         best = np.argmax(self.scores_)
         self.fitted_ = True
-        self.n_clusters_ = best + self.min_clusters
+        self.n_clusters_ = int(self.evaluated_[best])
         self.best_score_ = self.scores_[best]
         self.best_ = self.estimators_[best]
         self.labels_ = self.best_.labels_
@@ -1,5 +1,6 @@
 import logging
 import sys
+import uuid
 from functools import partial
 
 import numpy as np
@@ -13,11 +14,22 @@ from sklearn.base import (
 from sklearn.utils.validation import check_is_fitted
 
 from divik.cluster._kmeans._core import KMeans
-from divik.core import configurable
-from divik.sampler import BaseSampler
+from divik.core import (
+    configurable,
+    context_if,
+    get_n_jobs,
+    maybe_pool,
+    share,
+)
+from divik.sampler import BaseSampler, PrecomputedSampler, UniformSampler
 from divik.score import gap, sampled_gap
 
 _BIG_PRIME = 32801
+_DATA = {}
+
+
+def _pool_initialize(ref, data, references):
+    _DATA[ref] = data, references
 
 
 @configurable
@@ -58,6 +70,23 @@ class GAPSearch(BaseEstimator, ClusterMixin, TransformerMixin):
     verbose: bool, default: False
         If True, shows progress with tqdm.
 
+    reuse_references: bool, default: False
+        If True, the reference data sets are drawn once and shared by all
+        the numbers of clusters, instead of being drawn anew for each of
+        them. Requires memory for ``n_trials`` reference data sets.
+
+    speculation: int, default: 1
+        The number of consecutive numbers of clusters evaluated concurrently,
+        bounded by ``n_jobs``. Each of them is fit and scored in a separate
+        process with the reference trials computed sequentially, and the
+        results past the stopping point are discarded. The outcome does not
+        depend on this setting.
+
+    batched: bool, default: False
+        If True, all the reference data sets are clustered in a single call
+        of ``KMeans.fit_predict_many`` instead of in separate jobs, which
+        pays off for small data sets. ``n_jobs`` does not apply to them then.
+
     Attributes
     ----------
     cluster_centers_: array, [n_clusters, n_features]
@@ -95,6 +124,9 @@ class GAPSearch(BaseEstimator, ClusterMixin, TransformerMixin):
         sample_size: int = 1000,
         drop_unfit: bool = False,
         verbose: bool = False,
+        reuse_references: bool = False,
+        speculation: int = 1,
+        batched: bool = False,
     ):
         super().__init__()
         assert min_clusters <= max_clusters
@@ -108,36 +140,62 @@ class GAPSearch(BaseEstimator, ClusterMixin, TransformerMixin):
         self.sample_size = sample_size
         self.drop_unfit = drop_unfit
         self.verbose = verbose
+        self.reuse_references = reuse_references
+        self.speculation = speculation
+        self.batched = batched
 
     def _should_sample(self, data):
         sampled_complexity = 2 * self.n_trials * self.sample_size ** 2
         normal_complexity = self.n_trials * data.shape[0] ** 2
         return sampled_complexity < normal_complexity
 
-    def _gap(self, data, kmeans):
+    def _references(self, data):
+        if self.reference_sampler is not None:
+            sampler = clone(self.reference_sampler)
+        elif self._should_sample(data):
+            sampler = UniformSampler(n_rows=self.sample_size)
+        else:
+            sampler = UniformSampler(n_rows=None)
+        sampler.fit(data)
+        logging.debug("Drawing reference data sets.")
+        return PrecomputedSampler.draw(sampler, self.n_trials, self.seed)
+
+    def _gap(self, data, kmeans, references=None, n_jobs=1):
         if self._should_sample(data):
             logging.debug("Selecting sampled GAP.")
             score = partial(sampled_gap, sample_size=self.sample_size)
         else:
             logging.debug("Selecting full GAP.")
             score = gap
+        if references is None:
+            seed = self.seed + _BIG_PRIME * kmeans.n_clusters
+            reference_sampler = self.reference_sampler
+        else:
+            # the same references are selected for each number of clusters
+            seed = self.seed
+            reference_sampler = references
         return score(
             data,
             kmeans,
-            n_jobs=self.n_jobs,
-            seed=self.seed + _BIG_PRIME * kmeans.n_clusters,
+            n_jobs=n_jobs,
+            seed=seed,
             n_trials=self.n_trials,
             return_deviation=True,
-            reference_sampler=self.reference_sampler,
+            reference_sampler=reference_sampler,
+            batched=self.batched,
         )
 
-    def _fit_kmeans(self, n_clusters, data):
+    def _fit_kmeans(self, n_clusters, data_ref, n_jobs=1):
+        data, references = _DATA[data_ref]
+        data = data.value
+        if references is not None:
+            references = PrecomputedSampler(references.value)
         kmeans = clone(self.kmeans)
         kmeans.n_clusters = n_clusters
         logging.debug(f"Fitting kmeans for {n_clusters} clusters.")
         kmeans.fit(data)
         logging.debug(f"Fitted kmeans for {n_clusters} clusters.")
-        idx, std = self._gap(data, kmeans)
+        idx, std = self._gap(data, kmeans, references, n_jobs)
         logging.debug(f"GAP index: {idx}; std: {std}.")
         return kmeans, idx, std
 
@@ -156,26 +214,44 @@ class GAPSearch(BaseEstimator, ClusterMixin, TransformerMixin):
             not used, present here for API consistency by convention.
 
         """
-        fit_kmeans = partial(self._fit_kmeans, data=X)
+        references = self._references(X) if self.reuse_references else None
         n_clusters = range(self.min_clusters, self.max_clusters + 1)
-        if self.verbose:
-            n_clusters = tqdm.tqdm(n_clusters, leave=False, file=sys.stdout)
+        n_processes = min(self.speculation, get_n_jobs(self.n_jobs))
+        # nested pools are not allowed, so concurrent runs score sequentially
+        n_jobs = self.n_jobs if n_processes == 1 else 1
 
-        self.fitted_ = False
-        self.estimators_ = []
-        self.scores_ = []
+        fitted = False
+        estimators, scores = [], []
         prev_gap = -np.inf
-        for n_clust in n_clusters:
-            kmeans, gap_, std = fit_kmeans(n_clust)
-            if prev_gap > gap_ + std:
-                self.fitted_ = True
-                break
-            prev_gap = gap_
-            self.estimators_.append(kmeans)
-            self.scores_.append((gap_, std))
-        if self.verbose:
-            n_clusters.close()
-        self.scores_ = np.array(self.scores_)
+        ref = str(uuid.uuid4())
+        with share(X) as x, context_if(
+            references is not None, share, getattr(references, "samples", None)
+        ) as r:
+            _DATA[ref] = x, r
+            # the pool evaluates the following numbers of clusters ahead and
+            # the surplus runs are terminated when leaving the pool context
+            with maybe_pool(
+                n_processes, initializer=_pool_initialize, initargs=(ref, x, r)
+            ) as pool:
+                fit_kmeans = partial(self._fit_kmeans, data_ref=ref, n_jobs=n_jobs)
+                results = pool.imap(fit_kmeans, n_clusters)
+                if self.verbose:
+                    results = tqdm.tqdm(
+                        results, total=len(n_clusters), leave=False, file=sys.stdout
+                    )
+                for kmeans, gap_, std in results:
+                    if prev_gap > gap_ + std:
+                        fitted = True
+                        break
+                    prev_gap = gap_
+                    estimators.append(kmeans)
+                    scores.append((gap_, std))
+                if self.verbose:
+                    results.close()
+            del _DATA[ref]
+        self.fitted_ = fitted
+        self.estimators_ = estimators
+        self.scores_ = np.array(scores)
 
         if self.fitted_:
             logging.debug("Fitted GAPSearch")
@@ -1,30 +1,45 @@
 import logging
+import uuid
 from abc import ABCMeta, abstractmethod
 from functools import partial
-from typing import (
-    List,
-    NamedTuple,
-    Union,
-)
+from typing import NamedTuple, Union
 
 import numpy as np
 import scipy.spatial.distance as dist
 from sklearn.linear_model import LinearRegression
 
-from divik.core import Centroids, Data
+from divik.core import (
+    Centroids,
+    Data,
+    float_dtype,
+    maybe_pool,
+    seed,
+    share,
+)
+from divik.core._distance import block_rows, closest, row_norms
 
 EPS = 1e-10
+CHUNK_BYTES = 16 * 2 ** 20
+
+_DATA = {}
+
+
+def _pool_initialize(ref, data):
+    _DATA[ref] = data
 
 
 class Initialization(object, metaclass=ABCMeta):
     """Initializes k-means algorithm"""
 
     @abstractmethod
-    def __call__(self, data: Data, number_of_centroids: int) -> Centroids:
+    def __call__(
+        self, data: Data, number_of_centroids: int, norms: np.ndarray = None
+    ) -> Centroids:
         """Generate initial centroids for k-means algorithm
 
         @param data: 2D matrix with observations in rows, features in columns
         @param number_of_centroids: number of centroids to be generated
+        @param norms: precomputed ``row_norms`` of data, if available
         @return: centroids, in rows
         """
         raise NotImplementedError(self.__class__.__name__ + " must implement __call__.")
@@ -45,6 +60,10 @@ def _find_residuals(data: Data, sample_weight=None) -> np.ndarray:
     return residuals
 
 
+def _allocate(data: Data, number_of_centroids: int) -> Centroids:
+    return np.full((number_of_centroids, data.shape[1]), np.nan, float_dtype(data))
+
+
 def _validate(data: Data, number_of_centroids: int):
     if number_of_centroids > data.shape[0]:
         msg = (
@@ -65,24 +84,27 @@ class ExtremeInitialization(Initialization):
     def __init__(self, distance: str):
         self.distance = distance
 
-    def __call__(self, data: Data, number_of_centroids: int) -> Centroids:
+    def __call__(
+        self, data: Data, number_of_centroids: int, norms: np.ndarray = None
+    ) -> Centroids:
         """Generate initial centroids for k-means algorithm
 
         @param data: 2D matrix with observations in rows, features in columns
         @param number_of_centroids: number of centroids to be generated
+        @param norms: precomputed ``row_norms`` of data, if available
         @return: centroids, in rows
         """
         _validate(data, number_of_centroids)
         residuals = _find_residuals(data)
-        centroids = np.nan * np.zeros((number_of_centroids, data.shape[1]))
+        centroids = _allocate(data, number_of_centroids)
         centroids[0] = data[np.argmax(residuals)]
 
         distances = np.inf * np.ones((data.shape[0],))
         for i in range(1, number_of_centroids):
-            current_distance = dist.cdist(
-                data, centroids[np.newaxis, i - 1], self.distance
+            _, current_distance = closest(
+                data, centroids[np.newaxis, i - 1], self.distance, norms=norms
             )
-            distances[:] = np.minimum(current_distance.ravel(), distances)
+            distances[:] = np.minimum(current_distance, distances)
             centroids[i] = data[np.argmax(distances)]
 
         return centroids
@@ -102,58 +124,57 @@ class PercentileInitialization(Initialization):
         assert np.any(matches), (value, values)
         return int(np.flatnonzero(matches)[0])
 
-    def __call__(self, data: Data, number_of_centroids: int) -> Centroids:
+    def __call__(
+        self, data: Data, number_of_centroids: int, norms: np.ndarray = None
+    ) -> Centroids:
         _validate(data, number_of_centroids)
         residuals = _find_residuals(data)
         selected = self._get_percentile_element(residuals)
-        centroids = np.nan * np.zeros((number_of_centroids, data.shape[1]))
+        centroids = _allocate(data, number_of_centroids)
         centroids[0] = data[selected]
         assert not np.any(np.isnan(centroids[0]))
 
         distances = np.inf * np.ones((data.shape[0],))
         for i in range(1, number_of_centroids):
             assert not np.any(np.isnan(centroids[np.newaxis, i - 1]))
-            current_distance = dist.cdist(
-                data, centroids[np.newaxis, i - 1], self.distance
+            _, current_distance = closest(
+                data, centroids[np.newaxis, i - 1], self.distance, norms=norms
             )
             nans = np.isnan(current_distance)
             if np.any(nans):
-                locations_of_nans = np.array(list(zip(*np.nonzero(nans))))
+                locations_of_nans = np.flatnonzero(nans)
                 msg = (
                     "Distances between points cannot be NaN. This "
                     + "indicates that your data is probably corrupted and "
                     + "analysis cannot be continued in this setting. Amount"
-                    + f" of NaNs: {nans.sum()}. At positions described by "
-                    + f"[spot, centroid]: {locations_of_nans}"
+                    + f" of NaNs: {nans.sum()}. At spots: {locations_of_nans}"
                 )
                 logging.error(msg)
                 raise ValueError(msg)
-            distances[:] = np.minimum(current_distance.ravel(), distances)
+            distances[:] = np.minimum(current_distance, distances)
             selected = self._get_percentile_element(distances)
             centroids[i] = data[selected]
 
         return centroids
 
 
-class Leaf(NamedTuple):
-    centroid: np.ndarray
-    count: int = 0
-
-
-KDTree = Union["Node", Leaf]
-
+class Leaves(NamedTuple):
+    """Leaves of KDTree stored in flat arrays"""
 
-class Node(NamedTuple):
-    left: KDTree = None
-    right: KDTree = None
+    index: np.ndarray
+    start: np.ndarray
+    end: np.ndarray
+    centroid: np.ndarray
+    count: np.ndarray
 
 
-def make_tree(X, leaf_size: int, _feature_idx: int = 0, selector=None) -> KDTree:
-    """Make KDTree out of the data
+def make_leaves(X, leaf_size: int) -> Leaves:
+    """Divide data into boxes of KDTree
 
     Construct a KDTree out of data using mean as a pivoting element.
-    Each split makes two segments. The result doesn't contain the original
-    data, just centroids in each box and count of items.
+    Each split makes two segments. The tree is built iteratively by
+    partitioning a single permutation of the observations, so the
+    observations of each box are contiguous in the permutation.
 
     Parameters
     ==========
@@ -166,50 +187,32 @@ def make_tree(X, leaf_size: int, _feature_idx: int = 0, selector=None) -> KDTree
 
     Returns
     =======
-    tree : KDTree
-        Lightweight KD-Tree over the data
-    """
-    if selector is None:
-        selector = np.ones((X.shape[0],), dtype=bool)
-    if selector.sum() < 2 * leaf_size:
-        centroid = X[selector, :].mean(axis=0, keepdims=True)
-        return Leaf(centroid, int(selector.sum()))
-    feature = X[selector, _feature_idx]
-    thr = np.mean(feature)
-    left_idx = selector.copy()
-    left_idx[selector] = feature < thr
-    right_idx = selector.copy()
-    right_idx[selector] = np.logical_not(left_idx[selector])
-    if left_idx[selector].all() or right_idx[selector].all():
-        centroid = X[selector, :].mean(axis=0, keepdims=True)
-        return Leaf(centroid, int(selector.sum()))
-    next_feature = (_feature_idx + 1) % X.shape[1]
-    return Node(
-        left=make_tree(
-            X, leaf_size=leaf_size, _feature_idx=next_feature, selector=left_idx
-        ),
-        right=make_tree(
-            X, leaf_size=leaf_size, _feature_idx=next_feature, selector=right_idx
-        ),
-    )
-
-
-def get_leaves(tree: KDTree) -> List[Leaf]:
-    """Extract leaves of the KDTree
-
-    Parameters
-    ==========
-    tree : KDTree
-        KDTree constructed on the data
-
-    Returns
-    =======
-    leaves : list of Leaf
-        All the leaves from the full depth of the tree
+    leaves : Leaves
+        Permutation of the observations, the bounds ``start:end`` of each
+        box within the permutation, centroids of the boxes and counts of
+        items. Boxes are ordered from the leftmost to the rightmost.
     """
-    if isinstance(tree, Leaf):
-        return [tree]
-    return get_leaves(tree.left) + get_leaves(tree.right)
+    index = np.arange(X.shape[0])
+    bounds = []
+    stack = [(0, X.shape[0], 0)]
+    while stack:
+        start, end, feature_idx = stack.pop()
+        segment = index[start:end]
+        if segment.size >= 2 * leaf_size:
+            feature = X[segment, feature_idx]
+            left = feature < np.mean(feature)
+            n_left = np.count_nonzero(left)
+            if 0 < n_left < segment.size:
+                # stable partition keeps the original order within boxes
+                index[start:end] = np.concatenate([segment[left], segment[~left]])
+                next_feature = (feature_idx + 1) % X.shape[1]
+                stack.append((start + n_left, end, next_feature))
+                stack.append((start, start + n_left, next_feature))
+                continue
+        bounds.append((start, end))
+    start, end = np.array(bounds, dtype=np.intp).T
+    centroid = np.vstack([X[index[s:e]].mean(axis=0) for s, e in bounds])
+    return Leaves(index, start, end, centroid, end - start)
 
 
 class KDTreeInitialization(Initialization):
@@ -219,7 +222,9 @@ class KDTreeInitialization(Initialization):
         self.distance = distance
         self.leaf_size = leaf_size
 
-    def __call__(self, data: Data, number_of_centroids: int) -> Centroids:
+    def __call__(
+        self, data: Data, number_of_centroids: int, norms: np.ndarray = None
+    ) -> Centroids:
         """Generate initial centroids for k-means algorithm"""
         _validate(data, number_of_centroids)
         leaf_size = self.leaf_size
@@ -229,21 +234,24 @@ class KDTreeInitialization(Initialization):
             else:
                 logging.error("leaf_size must be between 0 and 1 when float")
                 raise ValueError("leaf_size must be between 0 and 1 when float")
-        tree = make_tree(data, leaf_size=leaf_size)
-        leaves = get_leaves(tree)
-        box_centroids = np.vstack([l.centroid for l in leaves])
-        box_weights = np.array([l.count for l in leaves])
+        leaves = make_leaves(data, leaf_size=leaf_size)
+        box_centroids = leaves.centroid
+        box_weights = leaves.count
 
         residuals = _find_residuals(box_centroids, box_weights)
-        centroids = np.nan * np.zeros((number_of_centroids, data.shape[1]))
+        centroids = _allocate(data, number_of_centroids)
         centroids[0] = box_centroids[np.argmax(residuals)]
 
+        box_norms = row_norms(box_centroids, self.distance)
         distances = np.inf * np.ones((box_centroids.shape[0],))
         for i in range(1, number_of_centroids):
-            current_distance = dist.cdist(
-                box_centroids, centroids[np.newaxis, i - 1], self.distance
+            _, current_distance = closest(
+                box_centroids,
+                centroids[np.newaxis, i - 1],
+                self.distance,
+                norms=box_norms,
             )
-            distances[:] = np.minimum(current_distance.ravel(), distances)
+            distances[:] = np.minimum(current_distance, distances)
             centroids[i] = box_centroids[np.argmax(distances)]
 
         return centroids
@@ -269,7 +277,9 @@ class KDTreePercentileInitialization(Initialization):
         first_over = np.flatnonzero(over_percentile)[0]
         return idx[first_over]
 
-    def __call__(self, data: Data, number_of_centroids: int) -> Centroids:
+    def __call__(
+        self, data: Data, number_of_centroids: int, norms: np.ndarray = None
+    ) -> Centroids:
         """Generate initial centroids for k-means algorithm"""
         _validate(data, number_of_centroids)
         leaf_size = self.leaf_size
@@ -279,24 +289,224 @@ class KDTreePercentileInitialization(Initialization):
             else:
                 logging.error("leaf_size must be between 0 and 1 when float")
                 raise ValueError("leaf_size must be between 0 and 1 when float")
-        tree = make_tree(data, leaf_size=leaf_size)
-        leaves = get_leaves(tree)
-        box_centroids = np.vstack([l.centroid for l in leaves])
-        box_weights = np.array([l.count for l in leaves])
+        leaves = make_leaves(data, leaf_size=leaf_size)
+        box_centroids = leaves.centroid
+        box_weights = leaves.count
         normalized_weights = 100 * box_weights / np.sum(box_weights)
 
         residuals = _find_residuals(box_centroids, box_weights)
-        centroids = np.nan * np.zeros((number_of_centroids, data.shape[1]))
+        centroids = _allocate(data, number_of_centroids)
         idx = self._get_percentile_idx(residuals, normalized_weights)
         centroids[0] = box_centroids[idx]
 
+        box_norms = row_norms(box_centroids, self.distance)
         distances = np.inf * np.ones((box_centroids.shape[0],))
         for i in range(1, number_of_centroids):
-            current_distance = dist.cdist(
-                box_centroids, centroids[np.newaxis, i - 1], self.distance
+            _, current_distance = closest(
+                box_centroids,
+                centroids[np.newaxis, i - 1],
+                self.distance,
+                norms=box_norms,
             )
-            distances[:] = np.minimum(current_distance.ravel(), distances)
+            distances[:] = np.minimum(current_distance, distances)
             idx = self._get_percentile_idx(distances, normalized_weights)
             centroids[i] = box_centroids[idx]
 
         return centroids
+
+
+class PrecomputedInitialization(Initialization):
+    """Initializes k-means with leading rows of precomputed centroids
+
+    Greedy initializations select each centroid based only on the previously
+    selected ones, so centroids generated once for the largest number of
+    clusters initialize k-means for any smaller number of clusters.
+    """
+
+    def __init__(self, centroids: Centroids):
+        self.centroids = np.asarray(centroids)
+
+    def __call__(
+        self, data: Data, number_of_centroids: int, norms: np.ndarray = None
+    ) -> Centroids:
+        """Generate initial centroids for k-means algorithm"""
+        _validate(data, number_of_centroids)
+        if self.centroids.ndim != 2 or self.centroids.shape[1] != data.shape[1]:
+            msg = (
+                f"Precomputed centroids of shape {self.centroids.shape} "
+                + f"do not match data with {data.shape[1]} features"
+            )
+            logging.error(msg)
+            raise ValueError(msg)
+        if number_of_centroids > self.centroids.shape[0]:
+            msg = (
+                f"Number of centroids ({number_of_centroids}) greater than "
+                + f"number of precomputed centroids ({self.centroids.shape[0]})"
+            )
+            logging.error(msg)
+            raise ValueError(msg)
+        return self.centroids[:number_of_centroids].astype(float_dtype(data))
+
+
+class SubsampledInitialization(Initialization):
+    """Initializes k-means from a random subset of the data
+
+    Allows to restart k-means from different centroids with the
+    deterministic initializations.
+    """
+
+    def __init__(
+        self, initialization: Initialization, seed: int = 0, fraction: float = 0.5
+    ):
+        self.initialization = initialization
+        self.seed = seed
+        self.fraction = fraction
+
+    def __call__(
+        self, data: Data, number_of_centroids: int, norms: np.ndarray = None
+    ) -> Centroids:
+        """Generate initial centroids for k-means algorithm"""
+        _validate(data, number_of_centroids)
+        size = max(int(self.fraction * data.shape[0]), number_of_centroids)
+        with seed(self.seed):
+            rows = np.random.choice(data.shape[0], size=size, replace=False)
+        rows.sort()
+        subset_norms = None if norms is None else norms[rows]
+        return self.initialization(data[rows], number_of_centroids, norms=subset_norms)
+
+
+def _chunk_closest(bounds, centroids, distance, data_ref):
+    start, end, norms = bounds
+    data = _DATA[data_ref].value[start:end]
+    return closest(data, centroids, distance, norms=norms)
+
+
+def _weighted_kmeans(
+    candidates: Data, weights: np.ndarray, number_of_centroids: int, distance: str
+) -> Centroids:
+    """Recluster weighted candidates with k-means++ seeding and Lloyd steps"""
+    chosen = [np.random.choice(weights.size, p=weights / weights.sum())]
+    _, distances = closest(candidates, candidates[chosen], distance)
+    for _ in range(1, number_of_centroids):
+        probability = weights * distances ** 2
+        if probability.sum() > 0:
+            selected = np.random.choice(weights.size, p=probability / probability.sum())
+        else:
+            selected = np.flatnonzero(~np.isin(np.arange(weights.size), chosen))[0]
+        chosen.append(selected)
+        _, current = closest(candidates, candidates[np.newaxis, selected], distance)
+        distances = np.minimum(distances, current)
+    centroids = candidates[chosen].astype(np.float64)
+    for _ in range(10):
+        labels, _ = closest(candidates, centroids, distance)
+        totals = np.bincount(labels, weights, minlength=number_of_centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, weights[:, np.newaxis] * candidates)
+        nonempty = totals > 0
+        updated = centroids.copy()
+        updated[nonempty] = sums[nonempty] / totals[nonempty, np.newaxis]
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+    return centroids
+
+
+class ScalableInitialization(Initialization):
+    """Initializes k-means with k-means|| algorithm
+
+    Each round samples about ``oversampling * number_of_centroids``
+    candidates, each observation with probability proportional to its
+    squared distance from the candidates found so far. The candidates are
+    weighted by the number of observations closest to them and reclustered
+    into the centroids. Distances of each round are computed in parallel
+    over fixed chunks of data and the sampling is done by the calling
+    process, so the result depends only on the seed, not on ``n_jobs``.
+
+    References
+    ----------
+    Bahmani, B., Moseley, B., Vattani, A., Kumar, R., & Vassilvitskii, S.
+    (2012). Scalable k-means++. Proceedings of the VLDB Endowment, 5(7).
+    """
+
+    def __init__(
+        self,
+        distance: str,
+        n_rounds: int = 5,
+        oversampling: float = 2.0,
+        n_jobs: int = 1,
+        seed: int = 0,
+    ):
+        self.distance = distance
+        self.n_rounds = n_rounds
+        self.oversampling = oversampling
+        self.n_jobs = n_jobs
+        self.seed = seed
+
+    def __call__(
+        self, data: Data, number_of_centroids: int, norms: np.ndarray = None
+    ) -> Centroids:
+        """Generate initial centroids for k-means algorithm
+
+        @param data: 2D matrix with observations in rows, features in columns
+        @param number_of_centroids: number of centroids to be generated
+        @param norms: precomputed ``row_norms`` of data, if available
+        @return: centroids, in rows
+        """
+        _validate(data, number_of_centroids)
+        if norms is None:
+            norms = row_norms(data, self.distance)
+        # chunks do not depend on n_jobs, so neither do the distances
+        step = block_rows(data.shape[1], CHUNK_BYTES)
+        chunks = [
+            (
+                start,
+                start + step,
+                None if norms is None else norms[start : start + step],
+            )
+            for start in range(0, data.shape[0], step)
+        ]
+        ref = str(uuid.uuid4())
+        with seed(self.seed), share(data) as shared:
+            _DATA[ref] = shared
+            with maybe_pool(
+                self.n_jobs, initializer=_pool_initialize, initargs=(ref, shared)
+            ) as pool:
+
+                def closest_of(centroids):
+                    compute = partial(
+                        _chunk_closest,
+                        centroids=centroids,
+                        distance=self.distance,
+                        data_ref=ref,
+                    )
+                    labels, distances = zip(*pool.map(compute, chunks))
+                    return np.concatenate(labels), np.concatenate(distances)
+
+                def distances_to(centroids):
+                    return closest_of(centroids)[1]
+
+                candidates = [np.random.randint(data.shape[0])]
+                distances = distances_to(data[candidates])
+                for _ in range(self.n_rounds):
+                    cost = np.sum(distances ** 2)
+                    if cost == 0:
+                        break
+                    expected = self.oversampling * number_of_centroids
+                    probability = np.minimum(expected * distances ** 2 / cost, 1)
+                    draw = np.random.rand(data.shape[0])
+                    sampled = np.flatnonzero(draw < probability)
+                    if sampled.size == 0:
+                        continue
+                    candidates.extend(sampled)
+                    distances = np.minimum(distances, distances_to(data[sampled]))
+                while len(candidates) < number_of_centroids:
+                    furthest = int(np.argmax(distances))
+                    candidates.append(furthest)
+                    distances = np.minimum(distances, distances_to(data[[furthest]]))
+                labels, _ = closest_of(data[candidates])
+            del _DATA[ref]
+            weights = np.bincount(labels, minlength=len(candidates)).astype(float)
+            centroids = _weighted_kmeans(
+                data[candidates], weights, number_of_centroids, self.distance
+            )
+        return centroids.astype(float_dtype(data))
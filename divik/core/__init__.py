@@ -23,6 +23,7 @@ from ._types import (
 from ._utils import (
     build,
     context_if,
+    float_dtype,
     normalize_rows,
     visualize,
 )
@@ -36,6 +37,7 @@ __all__ = [
     "SegmentationMethod",
     "build",
     "context_if",
+    "float_dtype",
     "normalize_rows",
     "visualize",
     "get_n_jobs",
@@ -0,0 +1,167 @@
+"""Memory-bounded distance computations between observations and centroids
+
+Euclidean, squared euclidean, cosine and correlation distances are computed
+through matrix products, i.e. ``||x||^2 - 2 x.c + ||c||^2`` or ``1 - x.c``
+with ``c`` normalized. This employs BLAS and is much faster than the generic
+``scipy.spatial.distance.cdist`` for wide data. The statistics of the rows
+of data (``row_norms``) can be computed once and reused for all the
+subsequent computations with different centroids. Other distances fall back
+to ``cdist``.
+
+Euclidean products are always computed in double precision, like in
+scikit-learn. Their cross term cancels catastrophically in single precision
+for data far from the origin. Cosine and correlation products of normalized
+rows are bounded, so they are computed in the floating point type of the
+data and float32 data keeps the single precision BLAS throughput. The
+statistics of rows are accumulated in double precision. Even then, the
+cross term cancels for observations much closer to a centroid than to the
+origin, so such squared distances are recomputed from the differences.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+import scipy.spatial.distance as dst
+
+from ._types import Centroids, Data, IntLabels
+from ._utils import float_dtype
+
+BLOCK_BYTES = 16 * 2 ** 20
+GEMM_DISTANCES = ("euclidean", "sqeuclidean", "cosine", "correlation")
+# distances satisfying the triangle inequality
+METRICS = ("euclidean", "cityblock", "chebyshev", "minkowski")
+# squared distances below this fraction of the squared norms lose more than
+# a half of the significant digits of double precision to cancellation
+CANCELLATION = np.finfo(np.float64).eps ** 0.5
+
+
+def block_rows(n_columns: int, max_bytes: int = BLOCK_BYTES) -> int:
+    """Number of rows of a float64 distance block fitting the memory budget"""
+    return max(int(max_bytes // (8 * max(n_columns, 1))), 1)
+
+
+def _squared_norms(data: Data) -> np.ndarray:
+    return np.einsum("ij,ij->i", data, data, dtype=np.float64)
+
+
+def row_norms(data: Data, distance: str) -> Optional[np.ndarray]:
+    """Compute statistics of rows reused by the distance computations
+
+    @param data: observations in rows
+    @param distance: distance metric
+    @return: squared norms for euclidean distances, norms for cosine,
+    norms of centered rows for correlation and None otherwise
+    """
+    if distance in ("euclidean", "sqeuclidean"):
+        return _squared_norms(data)
+    if distance == "cosine":
+        return np.sqrt(_squared_norms(data))
+    if distance == "correlation":
+        norms = np.empty((data.shape[0],))
+        step = block_rows(data.shape[1])
+        for start in range(0, data.shape[0], step):
+            block = data[start : start + step]
+            centered = block - block.mean(axis=1, keepdims=True)
+            norms[start : start + step] = np.sqrt(_squared_norms(centered))
+        return norms
+    return None
+
+
+def _prepare_centroids(centroids: Centroids, distance: str, dtype: np.dtype):
+    centroids = np.asarray(centroids, dtype=np.float64)
+    if distance in ("euclidean", "sqeuclidean"):
+        return centroids, _squared_norms(centroids)
+    if distance == "correlation":
+        centroids = centroids - centroids.mean(axis=1, keepdims=True)
+    norms = np.sqrt(_squared_norms(centroids))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (centroids / norms[:, np.newaxis]).astype(dtype), None
+
+
+def _exact_squared(data: Data, centroids: Centroids, rows, cols) -> np.ndarray:
+    squared = np.empty((rows.size,))
+    step = block_rows(data.shape[1])
+    for start in range(0, rows.size, step):
+        block = slice(start, start + step)
+        differences = data[rows[block]] - centroids[cols[block]]
+        squared[block] = _squared_norms(differences)
+    return squared
+
+
+def _gemm_distances(data: Data, norms, centroids: Centroids, c_norms, distance):
+    if distance in ("euclidean", "sqeuclidean"):
+        products = data.astype(np.float64, copy=False) @ centroids.T
+        products *= -2
+        products += norms[:, np.newaxis]
+        products += c_norms
+        scale = norms[:, np.newaxis] + c_norms
+        rows, cols = np.nonzero(products < CANCELLATION * scale)
+        products[rows, cols] = _exact_squared(data, centroids, rows, cols)
+        np.maximum(products, 0, out=products)
+        if distance == "euclidean":
+            np.sqrt(products, out=products)
+        return products
+    products = (data @ centroids.T).astype(np.float64, copy=False)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        products /= norms[:, np.newaxis]
+    return np.subtract(1, products, out=products)
+
+
+def pairwise(
+    data: Data, centroids: Centroids, distance: str, norms: np.ndarray = None
+) -> np.ndarray:
+    """Compute distances between all observations and centroids
+
+    @param data: observations in rows
+    @param centroids: centroids in rows
+    @param distance: distance metric supported by scipy
+    @param norms: precomputed ``row_norms`` of data
+    @return: matrix of distances, observations in rows
+    """
+    if distance not in GEMM_DISTANCES:
+        return dst.cdist(data, centroids, distance)
+    if norms is None:
+        norms = row_norms(data, distance)
+    centroids, c_norms = _prepare_centroids(centroids, distance, float_dtype(data))
+    return _gemm_distances(data, norms, centroids, c_norms, distance)
+
+
+def closest(
+    data: Data,
+    centroids: Centroids,
+    distance: str,
+    max_bytes: int = BLOCK_BYTES,
+    norms: np.ndarray = None,
+) -> Tuple[IntLabels, np.ndarray]:
+    """Find closest centroids and distances to them
+
+    Distances are computed for consecutive blocks of rows, so only a single
+    block of the distance matrix is held in the memory at once.
+
+    @param data: observations in rows
+    @param centroids: centroids in rows
+    @param distance: distance metric supported by scipy
+    @param max_bytes: memory budget for a single block of distances
+    @param norms: precomputed ``row_norms`` of data
+    @return: labels of the closest centroids and distances to them
+    """
+    gemm = distance in GEMM_DISTANCES
+    if gemm:
+        if norms is None:
+            norms = row_norms(data, distance)
+        prepared, c_norms = _prepare_centroids(
+            centroids, distance, float_dtype(data)
+        )
+    labels = np.empty((data.shape[0],), dtype=np.intp)
+    distances = np.empty((data.shape[0],))
+    step = block_rows(centroids.shape[0], max_bytes)
+    for start in range(0, data.shape[0], step):
+        stop = min(start + step, data.shape[0])
+        if gemm:
+            block = _gemm_distances(
+                data[start:stop], norms[start:stop], prepared, c_norms, distance
+            )
+        else:
+            block = dst.cdist(data[start:stop], centroids, distance)
+        labels[start:stop] = np.argmin(block, axis=1)
+        distances[start:stop] = block[np.arange(stop - start), labels[start:stop]]
+    return labels, distances
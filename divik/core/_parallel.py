@@ -7,7 +7,7 @@ from contextlib import contextmanager
 
 # RawArray exists, but PyCharm goes crazy
 # noinspection PyUnresolvedReferences
-from multiprocessing import Pool, RawArray
+from multiprocessing import Pool, RawArray, current_process
 
 import numpy as np
 
@@ -150,6 +150,10 @@ class DummyPool:
     def map(self, func, iterable, chunksize=None):
         return [func(v) for v in iterable]
 
+    # noinspection PyUnusedLocal
+    def imap(self, func, iterable, chunksize=1):
+        return (func(v) for v in iterable)
+
     # noinspection PyUnusedLocal
     def starmap(self, func, iterable, chunksize=None):
         return [func(*v) for v in iterable]
@@ -159,6 +163,9 @@ class DummyPool:
 def maybe_pool(processes: int = None, *args, **kwargs):
     """Create ``multiprocessing.Pool`` if multiple CPUs are allowed
 
+    Workers of a pool cannot start pools of their own, so nested calls
+    run sequentially.
+
     Examples
     --------
 
@@ -171,7 +178,7 @@ def maybe_pool(processes: int = None, *args, **kwargs):
     ...     pool.map(id, range(10000))
     """
     n_jobs = get_n_jobs(processes)
-    if n_jobs == 1 or n_jobs == 0:
+    if n_jobs == 1 or n_jobs == 0 or current_process().daemon:
         yield DummyPool(n_jobs, *args, **kwargs)
     else:
         with Pool(n_jobs, *args, **kwargs) as pool:
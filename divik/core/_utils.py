@@ -17,11 +17,26 @@ from .. import __version__
 from ._types import Data
 
 
+def float_dtype(data: Data) -> np.dtype:
+    """Floating point type of computations for the data
+
+    Single and double precision data are processed in their own precision,
+    so float32 data never gets promoted. Everything else is processed in
+    double precision.
+    """
+    dtype = np.dtype(getattr(data, "dtype", np.float64))
+    if dtype in (np.float32, np.float64):
+        return dtype
+    return np.dtype(np.float64)
+
+
 def normalize_rows(data: Data) -> Data:
     """Translate and scale rows to zero mean and vector length equal one"""
-    normalized = data - data.mean(axis=1)[:, np.newaxis]
-    norms = np.sum(np.abs(normalized) ** 2, axis=-1, keepdims=True) ** (1.0 / 2)
-    normalized /= norms
+    dtype = float_dtype(data)
+    means = data.mean(axis=1, dtype=np.float64)
+    normalized = np.subtract(data, means[:, np.newaxis].astype(dtype), dtype=dtype)
+    norms = np.sqrt(np.einsum("ij,ij->i", normalized, normalized, dtype=np.float64))
+    normalized /= norms[:, np.newaxis].astype(dtype)
     return normalized
 
 
@@ -10,7 +10,9 @@ from scipy import io as scio
 import divik.core as u
 
 
-def _load_mat_with(path: str, backend=scio.loadmat, ignore="__") -> np.ndarray:
+def _load_mat_with(
+    path: str, backend=scio.loadmat, ignore="__", dtype=None
+) -> np.ndarray:
     data = backend(path)
     logging.debug("Data file opened successfully.")
     key = [key for key in list(data.keys()) if not key.startswith(ignore)]
@@ -25,45 +27,54 @@ def _load_mat_with(path: str, backend=scio.loadmat, ignore="__") -> np.ndarray:
     logging.debug("Selecting variable: {0}".format(key[0]))
     selected = data[key[0]]
     logging.debug("Loaded variable from file.")
-    contignuous = np.array(selected, dtype=float)
+    if dtype is None:
+        dtype = u.float_dtype(selected)
+    contignuous = np.array(selected, dtype=dtype)
     logging.debug("Converted to contignuous.")
     return contignuous
 
 
-def _load_mat(path: str) -> np.ndarray:
+def _load_mat(path: str, dtype=None) -> np.ndarray:
     logging.debug("Loading MAT-file: " + path)
     try:
         logging.debug("Trying out legacy MAT-file loader.")
-        return _load_mat_with(path, backend=scio.loadmat, ignore="__")
+        return _load_mat_with(path, backend=scio.loadmat, ignore="__", dtype=dtype)
     except NotImplementedError:  # v7.3 MATLAB HDF5 MAT-File
         logging.debug("Legacy MAT-file loader failed, restarting with HDF5 loader.")
         hdf5 = partial(h5py.File, mode="r")
-        return _load_mat_with(path, backend=hdf5, ignore="#").T
+        return _load_mat_with(path, backend=hdf5, ignore="#", dtype=dtype).T
 
 
-def load_data(path: str) -> u.Data:
-    """Load 2D tabular data from file"""
+def load_data(path: str, dtype=None) -> u.Data:
+    """Load 2D tabular data from file
+
+    Floating point data keeps its precision, unless ``dtype`` is specified.
+    Text files are parsed as float64 by default.
+    """
     logging.info("Loading data: " + path)
     normalized = path.lower()
     if normalized.endswith(".csv"):
-        loader = partial(np.loadtxt, delimiter=",")
+        loader = partial(np.loadtxt, delimiter=",", dtype=dtype or float)
     elif normalized.endswith(".txt"):
-        loader = np.loadtxt
+        loader = partial(np.loadtxt, dtype=dtype or float)
     elif normalized.endswith(".npy"):
         loader = np.load
     elif normalized.endswith(".mat"):
-        loader = _load_mat
+        loader = partial(_load_mat, dtype=dtype)
     else:
         message = "Unsupported data format: " + os.path.splitext(path)[1]
         logging.error(message)
         raise IOError(message)
-    return loader(path)
+    data = loader(path)
+    if dtype is not None:
+        data = data.astype(dtype, copy=False)
+    return data
 
 
-def try_load_data(path):
+def try_load_data(path, dtype=None):
     """Load 2D tabular data from file with logging"""
     try:
-        data = load_data(path)
+        data = load_data(path, dtype=dtype)
         logging.debug("Data loaded successfully.")
     except Exception as ex:
         logging.error("Data loading failed with an exception.")
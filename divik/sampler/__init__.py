@@ -1,6 +1,7 @@
 """Sampling methods for statistical indices computation purposes"""
 
 from ._core import BaseSampler, ParallelSampler
+from ._precomputed_sampler import PrecomputedSampler
 from ._stratified_sampler import StratifiedSampler
 from ._uniform_sampler import UniformPCASampler, UniformSampler
 
@@ -10,4 +11,5 @@ __all__ = [
     "UniformSampler",
     "UniformPCASampler",
     "StratifiedSampler",
+    "PrecomputedSampler",
 ]
@@ -0,0 +1,127 @@
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+from divik.core import configurable, share
+
+from ._core import BaseSampler, ParallelSampler
+
+_DATA = {}
+
+
+@configurable
+class PrecomputedSampler(BaseSampler):
+    """Serve samples drawn in advance
+
+    Seeds are mapped onto the stored samples by modulo, so consecutive
+    seeds, as well as seeds spaced by a step coprime with the number of
+    samples, yield distinct samples.
+
+    Parameters
+    -----------
+    samples : array_like, shape (n_samples, n_rows, n_cols)
+        Samples stacked along the first axis
+
+    Attributes
+    ----------
+    shape_ : (n_rows, n_cols)
+        Shape of the drawn samples
+    """
+
+    def __init__(self, samples: np.ndarray):
+        self.samples = samples
+
+    @property
+    def n_samples(self):
+        return len(self.samples)
+
+    @property
+    def shape_(self):
+        return self.samples.shape[1:]
+
+    @classmethod
+    def draw(cls, sampler: BaseSampler, n_samples: int, seed: int = 0):
+        """Draw samples once from a fitted sampler
+
+        Parameters
+        ----------
+        sampler : BaseSampler
+            Sampler fitted to the data
+
+        n_samples : int
+            Number of samples to draw
+
+        seed : int, default: 0
+            Seed of the first sample, the following use consecutive seeds
+
+        Returns
+        -------
+        sampler : PrecomputedSampler
+            Sampler serving the drawn samples
+        """
+        first = sampler.get_sample(seed)
+        samples = np.empty((n_samples,) + first.shape, dtype=first.dtype)
+        samples[0] = first
+        for i in range(1, n_samples):
+            samples[i] = sampler.get_sample(seed + i)
+        return cls(samples)
+
+    def fit(self, X, y=None):
+        """Samples are independent of the data, so nothing is fit
+
+        Returns
+        -------
+        self : PrecomputedSampler
+            Returns the instance itself.
+        """
+        return self
+
+    def get_sample(self, seed):
+        """Return specific sample
+
+        Parameters
+        ----------
+        seed : int
+            The seed to use to select the sample
+
+        Returns
+        -------
+        sample : array_like, (*self.shape_)
+            Returns the stored sample
+        """
+        return self.samples[seed % self.n_samples]
+
+    @contextmanager
+    def parallel(self):
+        global _DATA
+        ref = str(uuid.uuid4())
+        with share(self.samples) as samples:
+            _DATA[ref] = (samples,)
+            try:
+                yield PrecomputedParallelSampler(ref)
+            finally:
+                del _DATA[ref]
+
+
+class PrecomputedParallelSampler(ParallelSampler):
+    def __init__(self, ref):
+        self._ref = ref
+
+    @property
+    def sampler(self):
+        global _DATA
+        (samples,) = _DATA[self._ref]
+        return PrecomputedSampler(samples.value)
+
+    def get_sample(self, seed):
+        return self.sampler.get_sample(seed)
+
+    def initializer(self, *args):
+        global _DATA
+        _DATA[self._ref] = args
+
+    @property
+    def initargs(self):
+        global _DATA
+        return _DATA[self._ref]
@@ -75,6 +75,8 @@ class UniformSampler(BaseSampler):
         """
         with seed_(seed):
             unscaled = np.random.random_sample(self.shape_)
+        # samples follow the precision of the fitted data
+        unscaled = unscaled.astype(self.scaler_.data_min_.dtype, copy=False)
         return self.scaler_.inverse_transform(unscaled)
 
 
@@ -1,3 +1,5 @@
+from ._cache import cached_distances
 from ._dunn import dunn, sampled_dunn
 from ._gap import gap
 from ._sampled_gap import sampled_gap
+from ._variance_ratio import duda_hart, variance_ratio
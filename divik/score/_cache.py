@@ -0,0 +1,151 @@
+"""Pairwise distances reused between scoring calls
+
+Scores of clusterings with different number of clusters are computed on
+the same data. Within ``cached_distances`` scope, the full distance matrix
+of such data is computed once and the subsequent calls only reduce its
+parts. Samples are drawn for the labels of each clustering, so they are
+scored outside of the cache.
+"""
+import hashlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+
+from divik.core import Data, float_dtype
+from divik.core._distance import block_rows, pairwise, row_norms
+
+
+class DistanceCache:
+    """Least recently used distance matrices within the memory budget
+
+    Matrices are identified by the content of the data, so copies of the
+    data share the entry.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._matrices = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def _key(data: Data, distance: str):
+        digest = hashlib.blake2b(np.ascontiguousarray(data).data).hexdigest()
+        return digest, data.shape, str(data.dtype), distance
+
+    def _store(self, key, matrix: np.ndarray):
+        while self._matrices and self._bytes + matrix.nbytes > self.max_bytes:
+            _, evicted = self._matrices.popitem(last=False)
+            self._bytes -= evicted.nbytes
+        self._matrices[key] = matrix
+        self._bytes += matrix.nbytes
+
+    def add(self, data: Data, distance: str, matrix: np.ndarray):
+        """Store distance matrix of the data computed elsewhere"""
+        key = self._key(data, distance)
+        if key not in self._matrices and matrix.nbytes <= self.max_bytes:
+            self._store(key, matrix)
+
+    def __call__(self, data: Data, distance: str) -> Optional[np.ndarray]:
+        """Get distance matrix of the data
+
+        @param data: observations in rows
+        @param distance: distance metric
+        @return: square matrix of distances or None if it exceeds the budget
+        """
+        dtype = float_dtype(data)
+        size = data.shape[0] ** 2 * dtype.itemsize
+        if size > self.max_bytes:
+            return None
+        key = self._key(data, distance)
+        if key in self._matrices:
+            self._matrices.move_to_end(key)
+            return self._matrices[key]
+        matrix = _distance_matrix(data, distance, dtype)
+        self._store(key, matrix)
+        return matrix
+
+
+def _distance_matrix(data: Data, distance: str, dtype) -> np.ndarray:
+    matrix = np.empty((data.shape[0], data.shape[0]), dtype=dtype)
+    norms = row_norms(data, distance)
+    step = block_rows(data.shape[0])
+    for start in range(0, data.shape[0], step):
+        block_norms = None if norms is None else norms[start : start + step]
+        matrix[start : start + step] = pairwise(
+            data[start : start + step], data, distance, block_norms
+        )
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
+
+_CACHE: Optional[DistanceCache] = None
+
+
+@contextmanager
+def cached_distances(max_bytes: int = 2 ** 30):
+    """Reuse pairwise distances between scoring calls within the scope
+
+    Each process keeps its own cache, so pools should be created within
+    the scope. Matrices needed by all the workers should be computed before
+    the pool is created and handed to them with ``adopt_distances``.
+
+    Parameters
+    ----------
+    max_bytes : int, default: 1 GiB
+        Memory budget for the cached distance matrices. Data requiring more
+        memory is scored without caching.
+
+    Examples
+    --------
+
+    >>> from divik.score import cached_distances
+    >>> with cached_distances(max_bytes=2 ** 30):
+    ...     dunn_search.fit(X)
+    """
+    with _using(DistanceCache(max_bytes)) as cache:
+        yield cache
+
+
+@contextmanager
+def _using(cache: Optional[DistanceCache]):
+    global _CACHE
+    previous, _CACHE = _CACHE, cache
+    try:
+        yield cache
+    finally:
+        _CACHE = previous
+
+
+def uncached_distances():
+    """Scope computing pairwise distances without the cache"""
+    return _using(None)
+
+
+def distance_matrix(data: Data, distance: str) -> Optional[np.ndarray]:
+    """Cached distance matrix of the data, None if caching is disabled"""
+    if _CACHE is None:
+        return None
+    return _CACHE(data, distance)
+
+
+def adopt_distances(data: Data, distance: str, matrix: np.ndarray, max_bytes: int):
+    """Put distance matrix computed by the parent process into the cache
+
+    Enables the cache of ``max_bytes`` if a pool worker does not inherit it.
+    """
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = DistanceCache(max_bytes)
+    _CACHE.add(data, distance, matrix)
+
+
+def reduce_block(matrix: np.ndarray, rows, columns, reduction) -> float:
+    """Reduce submatrix of distances, gathering a single block at a time"""
+    step = block_rows(len(columns))
+    partial = [
+        reduction(matrix[np.ix_(rows[start : start + step], columns)])
+        for start in range(0, len(rows), step)
+    ]
+    return reduction(partial)
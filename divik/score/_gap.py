@@ -1,9 +1,8 @@
 import logging
 from functools import partial
+from typing import List
 
 import numpy as np
-import pandas as pd
-import scipy.spatial.distance as dist
 from sklearn.base import clone
 
 from divik.core import (
@@ -13,6 +12,7 @@ from divik.core import (
     seeded,
 )
 from divik.sampler import BaseSampler, UniformSampler
+from divik.score._kernels import mean_distances
 
 KMeans = "divik.KMeans"
 _BIG_PRIME = 54673
@@ -29,16 +29,7 @@ def _dispersion(data: Data, kmeans: KMeans) -> float:
     assert data.shape[0] == kmeans.labels_.size, "kmeans not fit on this data"
     if getattr(kmeans, "normalize_rows", False):
         data = normalize_rows(data)
-    clusters = pd.DataFrame(data).groupby(kmeans.labels_)
-    return float(
-        np.mean(
-            [
-                np.mean(dist.pdist(cluster_members.values, _get_distance(kmeans)))
-                for _, cluster_members in clusters
-                if cluster_members.shape[0] != 1
-            ]
-        )
-    )
+    return float(np.mean(mean_distances(data, kmeans.labels_, _get_distance(kmeans))))
 
 
 def _sampled_dispersion(
@@ -57,16 +48,25 @@ def _sampled_dispersion(
         logging.debug("Predicting labels for sample.")
         y = kmeans.predict(X)
     logging.debug("Computing dispersion for clustered sample.")
-    clusters = pd.DataFrame(X).groupby(y)
-    return float(
-        np.mean(
-            [
-                np.mean(dist.pdist(cluster_members.values, _get_distance(kmeans)))
-                for _, cluster_members in clusters
-                if cluster_members.shape[0] != 1
-            ]
+    return float(np.mean(mean_distances(X, y, _get_distance(kmeans))))
+
+
+def _batched_dispersions(seeds, sampler: BaseSampler, kmeans: KMeans) -> List[float]:
+    """Dispersions of samples clustered together, if kmeans supports it"""
+    logging.debug(f"Sampling with seeds {seeds}.")
+    samples = np.stack([sampler.get_sample(seed) for seed in seeds])
+    if getattr(kmeans, "normalize_rows", False):
+        logging.debug("Normalizing rows.")
+        samples = normalize_rows(samples.reshape(-1, samples.shape[-1])).reshape(
+            samples.shape
         )
-    )
+    logging.debug("Fitting kmeans for stacked samples.")
+    labels = kmeans.fit_predict_many(samples)
+    logging.debug("Computing dispersion for clustered samples.")
+    distance = _get_distance(kmeans)
+    return [
+        float(np.mean(mean_distances(X, y, distance))) for X, y in zip(samples, labels)
+    ]
 
 
 def gap(
@@ -77,14 +77,19 @@ def gap(
     n_trials: int = 100,
     return_deviation: bool = False,
     reference_sampler=None,
+    batched: bool = False,
 ) -> float:
     if reference_sampler is None:
         reference_sampler = UniformSampler(n_rows=None, n_samples=n_trials)
     reference_ = reference_sampler.fit(data)
     kmeans_ = clone(kmeans)
     seeds = list(seed + np.arange(n_trials) * _BIG_PRIME)
-    with reference_.parallel() as r:
-        with maybe_pool(n_jobs, initializer=r.initializer, initargs=r.initargs) as pool:
+    if batched and hasattr(kmeans_, "fit_predict_many"):
+        ref_disp = _batched_dispersions(seeds, reference_, kmeans_)
+    else:
+        with reference_.parallel() as r, maybe_pool(
+            n_jobs, initializer=r.initializer, initargs=r.initargs
+        ) as pool:
             compute_disp = partial(_sampled_dispersion, sampler=r, kmeans=kmeans_)
             ref_disp = pool.map(compute_disp, seeds)
     ref_disp = np.log(ref_disp)
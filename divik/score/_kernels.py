@@ -0,0 +1,93 @@
+"""Distance reductions over clusters
+
+Observations are grouped by sorting the labels once, so each cluster is
+a contiguous slice of a single permutation of the observations. Pairwise
+distances are reduced block by block and the full distance matrix is
+never held in the memory.
+"""
+from typing import List, NamedTuple
+
+import numpy as np
+
+from divik.core import Data, IntLabels
+from divik.core._distance import block_rows, pairwise, row_norms
+from divik.score._cache import distance_matrix, reduce_block
+
+
+class Groups(NamedTuple):
+    """Observations grouped by label"""
+
+    order: np.ndarray
+    labels: np.ndarray
+    start: np.ndarray
+    end: np.ndarray
+
+    def members(self, i: int) -> np.ndarray:
+        """Indices of the observations in i-th group"""
+        return self.order[self.start[i] : self.end[i]]
+
+    def tail(self, i: int) -> np.ndarray:
+        """Indices of the observations in the groups following i-th group"""
+        return self.order[self.end[i] :]
+
+
+def group(labels: IntLabels) -> Groups:
+    """Group observations by label
+
+    @param labels: label of each observation
+    @return: permutation of observations sorted by label and the bounds of
+    the groups within the permutation, for each present label
+    """
+    labels = np.asarray(labels).ravel()
+    order = np.argsort(labels, kind="stable")
+    present, start = np.unique(labels[order], return_index=True)
+    end = np.append(start[1:], labels.size)
+    return Groups(order, present, start, end)
+
+
+def _pair_blocks(points: Data, distance: str):
+    """Blocks of distances, each pair of points included exactly once
+
+    Distances not belonging to any pair are zeroed.
+    """
+    norms = row_norms(points, distance)
+    step = block_rows(points.shape[0])
+    for start in range(0, points.shape[0], step):
+        stop = min(start + step, points.shape[0])
+        block_norms = None if norms is None else norms[start:stop]
+        block = pairwise(points[start:stop], points[start:], distance, block_norms)
+        # pairs within the block rows are in the upper triangle
+        block[:, : stop - start] = np.triu(block[:, : stop - start], k=1)
+        yield block
+
+
+def max_pairwise(points: Data, distance: str) -> float:
+    """Maximal distance between points"""
+    result = 0.0
+    for block in _pair_blocks(points, distance):
+        result = max(result, np.max(block, initial=0.0))
+    return result
+
+
+def mean_pairwise(points: Data, distance: str) -> float:
+    """Average distance between distinct pairs of points"""
+    total = 0.0
+    for block in _pair_blocks(points, distance):
+        total += np.sum(block)
+    n_pairs = points.shape[0] * (points.shape[0] - 1) / 2
+    return total / n_pairs
+
+
+def mean_distances(data: Data, labels: IntLabels, distance: str) -> List[float]:
+    """Average pairwise distance within each cluster of more than one member"""
+    groups = group(labels)
+    members = [groups.members(i) for i in range(groups.labels.size)]
+    members = [m for m in members if m.size > 1]
+    matrix = distance_matrix(data, distance)
+    if matrix is not None:
+        # both orders of each pair are summed and the diagonal is zero
+        return [
+            reduce_block(matrix, m, m, np.sum) / (m.size * (m.size - 1))
+            for m in members
+        ]
+    return [mean_pairwise(data[m], distance) for m in members]
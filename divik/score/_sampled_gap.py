@@ -7,6 +7,7 @@ from sklearn.base import clone
 
 from divik.core import Data, maybe_pool
 from divik.sampler import StratifiedSampler, UniformSampler
+from divik.score._gap import _batched_dispersions
 from divik.score._gap import _sampled_dispersion as _dispersion
 
 KMeans = "divik.cluster.KMeans"
@@ -27,6 +28,7 @@ def sampled_gap(
     n_trials: int = 100,
     return_deviation: bool = False,
     reference_sampler=None,
+    batched: bool = False,
 ) -> float:
     # TODO: Docs
     logging.debug("Creating samplers.")
@@ -39,19 +41,26 @@ def sampled_gap(
     kmeans_ = clone(kmeans)
     seeds = list(seed + np.arange(n_trials) * _BIG_PRIME)
     logging.debug(f"Generated seeds: {seeds}.")
-    logging.debug(f"Entering parallel context with n_jobs={n_jobs}.")
-    with data_.parallel() as d, reference_.parallel() as r:
-        initializer = partial(_pool_initialize, [d, r])
-        with maybe_pool(
-            n_jobs, initializer=initializer, initargs=(d.initargs, r.initargs)
-        ) as pool:
-            logging.debug("Computing reference dispersion.")
-            compute_disp = partial(_dispersion, sampler=r, kmeans=kmeans_)
-            ref_disp = pool.map(compute_disp, seeds)
-            logging.debug("Computing data dispersion.")
-            compute_disp = partial(_dispersion, sampler=d, kmeans=kmeans, fit=False)
-            data_disp = pool.map(compute_disp, seeds)
-    logging.debug("Left parallel context.")
+    if batched and hasattr(kmeans_, "fit_predict_many"):
+        logging.debug("Computing reference dispersion in batch.")
+        ref_disp = _batched_dispersions(seeds, reference_, kmeans_)
+        logging.debug("Computing data dispersion.")
+        compute_disp = partial(_dispersion, sampler=data_, kmeans=kmeans, fit=False)
+        data_disp = [compute_disp(seed) for seed in seeds]
+    else:
+        logging.debug(f"Entering parallel context with n_jobs={n_jobs}.")
+        with data_.parallel() as d, reference_.parallel() as r:
+            initializer = partial(_pool_initialize, [d, r])
+            with maybe_pool(
+                n_jobs, initializer=initializer, initargs=(d.initargs, r.initargs)
+            ) as pool:
+                logging.debug("Computing reference dispersion.")
+                compute_disp = partial(_dispersion, sampler=r, kmeans=kmeans_)
+                ref_disp = pool.map(compute_disp, seeds)
+                logging.debug("Computing data dispersion.")
+                compute_disp = partial(_dispersion, sampler=d, kmeans=kmeans, fit=False)
+                data_disp = pool.map(compute_disp, seeds)
+        logging.debug("Left parallel context.")
     ref_disp = np.log(ref_disp)
     data_disp = np.log(data_disp)
     gap = np.mean(ref_disp) - np.mean(data_disp)
@@ -0,0 +1,101 @@
+import numpy as np
+
+from divik.core import Data, normalize_rows
+from divik.core._distance import block_rows
+
+KMeans = "divik.cluster.KMeans"
+
+
+def _prepare(kmeans: KMeans, data: Data) -> Data:
+    # squared euclidean distance between normalized rows is proportional to
+    # their correlation distance
+    if getattr(kmeans, "normalize_rows", False):
+        return normalize_rows(data)
+    return data
+
+
+def _within(data: Data, labels: np.ndarray, centroids: np.ndarray) -> float:
+    """Sum of squared distances of observations to their centroids"""
+    total = 0.0
+    step = block_rows(data.shape[1])
+    for start in range(0, data.shape[0], step):
+        block = data[start : start + step] - centroids[labels[start : start + step]]
+        total += np.einsum("ij,ij->", block, block, dtype=np.float64)
+    return total
+
+
+def _total(data: Data) -> float:
+    """Sum of squared distances of observations to their mean"""
+    mean = np.mean(data, axis=0, dtype=np.float64)
+    return _within(data, np.zeros(data.shape[0], dtype=int), mean[np.newaxis])
+
+
+def variance_ratio(kmeans: KMeans, data: Data) -> float:
+    """Compute Calinski-Harabasz variance ratio for the clustering
+
+    Both dispersions are computed from the centroids and labels in a single
+    pass over the data, without pairwise distances.
+
+    Parameters
+    ----------
+    kmeans : KMeans
+        KMeans object fitted to the data
+
+    data : array, shape (n_samples, n_features)
+        Clustered data
+
+    Returns
+    -------
+    variance_ratio : float
+        Ratio of between- to within-cluster dispersion, each divided by its
+        degrees of freedom. Greater is better. -inf for a single cluster.
+    """
+    centroids = np.asarray(kmeans.cluster_centers_, dtype=np.float64)
+    n_clusters = centroids.shape[0]
+    if n_clusters == 1:
+        return -np.inf
+    data = _prepare(kmeans, data)
+    labels = np.asarray(kmeans.labels_).ravel()
+    counts = np.bincount(labels, minlength=n_clusters)
+    mean = np.mean(data, axis=0, dtype=np.float64)
+    between = float(np.sum(counts * np.sum((centroids - mean) ** 2, axis=1)))
+    within = _within(data, labels, centroids)
+    if within == 0:
+        return np.inf
+    return between * (data.shape[0] - n_clusters) / (within * (n_clusters - 1))
+
+
+def duda_hart(kmeans: KMeans, data: Data, alpha: float = 3.2) -> bool:
+    """Test whether the data should be split into two clusters
+
+    Duda-Hart test compares the within-cluster dispersion of the split with
+    the dispersion of the whole data against its expected reduction for
+    data drawn from a single normal distribution.
+
+    Parameters
+    ----------
+    kmeans : KMeans
+        KMeans object with two clusters, fitted to the data
+
+    data : array, shape (n_samples, n_features)
+        Clustered data
+
+    alpha : float, default: 3.2
+        Critical value of the standard normal distribution. The default
+        corresponds to the significance level of about 0.001.
+
+    Returns
+    -------
+    split : bool
+        True if the hypothesis of a single cluster is rejected
+    """
+    data = _prepare(kmeans, data)
+    labels = np.asarray(kmeans.labels_).ravel()
+    centroids = np.asarray(kmeans.cluster_centers_, dtype=np.float64)
+    ratio = _within(data, labels, centroids) / _total(data)
+    n_samples, n_features = data.shape
+    deviation = np.sqrt(
+        2 * (1 - 8 / (np.pi ** 2 * n_features)) / (n_samples * n_features)
+    )
+    critical = 1 - 2 / (np.pi * n_features) - alpha * deviation
+    return bool(ratio < critical)
@@ -1,8 +1,13 @@
+import glob
+import os
+import tempfile
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import numpy as np
 import numpy.testing as npt
+import pytest
+from sklearn.base import clone
 
 import divik.cluster._divik._backend as dv
 
@@ -29,21 +34,128 @@ SELECT_ALL = np.ones((10,), dtype=bool)
 
 class RecursiveSelectionTest(unittest.TestCase):
     def setUp(self):
-        self.selection = np.array([0, 0, 0, 1, 1, 0, 1, 0, 0, 1], dtype=bool)
+        self.selection = np.array([3, 4, 6, 9], dtype=np.int32)
         self.partition = np.array([1, 2, 2, 1], dtype=int)
 
     def test_selects_subset_of_elements_by_cluster_number(self):
         npt.assert_equal(
-            dv._recursive_selection(self.selection, self.partition, 1),
-            np.array([0, 0, 0, 1, 0, 0, 0, 0, 0, 1], dtype=bool),
+            dv._recursive_selection(self.selection, self.partition, 1), [3, 9]
         )
         npt.assert_equal(
-            dv._recursive_selection(self.selection, self.partition, 2),
-            np.array([0, 0, 0, 0, 1, 0, 1, 0, 0, 0], dtype=bool),
+            dv._recursive_selection(self.selection, self.partition, 2), [4, 6]
         )
 
     def test_selects_nothing_for_nonexistent_label(self):
+        npt.assert_equal(dv._recursive_selection(self.selection, self.partition, 3), [])
+
+    def test_keeps_compact_indices(self):
+        selected = dv._recursive_selection(self.selection, self.partition, 1)
+        assert selected.dtype == np.int32
+
+
+class AsIndicesTest(unittest.TestCase):
+    def test_converts_mask_to_compact_indices(self):
+        mask = np.array([0, 0, 0, 1, 1, 0, 1, 0, 0, 1], dtype=bool)
+        indices = dv._as_indices(mask)
+        npt.assert_equal(indices, [3, 4, 6, 9])
+        assert indices.dtype == np.int32
+
+    def test_compacts_indices(self):
+        indices = dv._as_indices(np.arange(5, dtype=np.int64))
+        npt.assert_equal(indices, np.arange(5))
+        assert indices.dtype == np.int32
+
+
+class GatherTest(unittest.TestCase):
+    def test_gathers_selected_features_of_observations(self):
+        indices = np.array([1, 3, 4], dtype=np.int32)
+        columns = np.array([0, 2])
         npt.assert_equal(
-            dv._recursive_selection(self.selection, self.partition, 3),
-            np.array([0, 0, 0, 0, 0, 0, 0, 0, 0, 0], dtype=bool),
+            dv._gather(DUMMY_DATA, indices, columns), DUMMY_DATA[indices][:, columns]
+        )
+
+
+class ParallelDivikTest(unittest.TestCase):
+    def test_gives_the_same_tree_as_sequential(self):
+        from sklearn.datasets import make_blobs
+
+        from divik.cluster import DiviK, DunnSearch, GAPSearch, KMeans
+
+        X, _ = make_blobs(n_samples=2000, n_features=2, centers=6, random_state=0)
+        single_kmeans = KMeans(n_clusters=2, distance="euclidean")
+        divik = DiviK(
+            kmeans=DunnSearch(single_kmeans, max_clusters=3),
+            fast_kmeans=GAPSearch(single_kmeans, max_clusters=2, n_trials=3),
+            distance="euclidean",
+            minimal_size=100,
+            filter_type="none",
+        )
+        sequential = clone(divik).fit(X)
+        parallel = clone(divik).set_params(n_jobs=2).fit(X)
+        assert parallel.depth_ > 1
+        npt.assert_equal(parallel.labels_, sequential.labels_)
+        assert parallel.paths_ == sequential.paths_
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        from sklearn.datasets import make_blobs
+
+        from divik.cluster import DiviK, DunnSearch, GAPSearch, KMeans
+
+        self.X, _ = make_blobs(n_samples=2000, n_features=2, centers=6, random_state=0)
+        single_kmeans = KMeans(n_clusters=2, distance="euclidean")
+        self.divik = DiviK(
+            kmeans=DunnSearch(single_kmeans, max_clusters=3),
+            fast_kmeans=GAPSearch(single_kmeans, max_clusters=2, n_trials=3),
+            distance="euclidean",
+            minimal_size=100,
+            filter_type="none",
         )
+
+    def test_resumes_from_stored_nodes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            expected = clone(self.divik).set_params(checkpoint_dir=tmp).fit(self.X)
+            nodes = sorted(glob.glob(os.path.join(tmp, "node*.pkl")))
+            removed = [n for n in nodes if os.path.basename(n).count("-") == 2]
+            for fname in removed:
+                os.remove(fname)
+            with patch.object(dv, "divide", wraps=dv.divide) as divide:
+                resumed = clone(self.divik).fit(self.X, resume_from=tmp)
+            assert divide.call_count == len(removed) > 0
+            npt.assert_equal(resumed.labels_, expected.labels_)
+            assert len(glob.glob(os.path.join(tmp, "node*.pkl"))) == len(nodes)
+
+    def test_does_not_reuse_nodes_of_a_different_configuration(self):
+        other = clone(self.divik).set_params(kmeans__max_clusters=2)
+        expected = clone(other).fit(self.X)
+        with tempfile.TemporaryDirectory() as tmp:
+            first = clone(self.divik).set_params(checkpoint_dir=tmp).fit(self.X)
+            refitted = clone(other).set_params(checkpoint_dir=tmp).fit(self.X)
+            assert first.n_clusters_ != expected.n_clusters_
+            npt.assert_equal(refitted.labels_, expected.labels_)
+            with pytest.raises(ValueError):
+                clone(self.divik).fit(self.X, resume_from=tmp)
+
+    def test_ignores_parallelism_when_resuming(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            expected = clone(self.divik).set_params(checkpoint_dir=tmp).fit(self.X)
+            parallel = clone(self.divik).set_params(n_jobs=2, verbose=True)
+            resumed = parallel.fit(self.X, resume_from=tmp)
+            npt.assert_equal(resumed.labels_, expected.labels_)
+
+    def test_rejects_different_data(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            clone(self.divik).set_params(checkpoint_dir=tmp).fit(self.X)
+            with pytest.raises(ValueError):
+                clone(self.divik).fit(self.X[::2], resume_from=tmp)
+
+    def test_rejects_missing_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            missing = os.path.join(tmp, "missing")
+            with pytest.raises(FileNotFoundError):
+                clone(self.divik).fit(self.X, resume_from=missing)
+            stored = clone(self.divik).set_params(checkpoint_dir=tmp)
+            with pytest.raises(FileNotFoundError):
+                stored.fit(self.X, resume_from=missing)
+            assert not os.path.exists(missing)
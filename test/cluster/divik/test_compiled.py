@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+from sklearn.datasets import make_blobs
+
+from divik.cluster import CompiledDiviK, DiviK, DunnSearch, GAPSearch, KMeans
+
+
+def _divik(distance, normalize_rows=False):
+    single_kmeans = KMeans(
+        n_clusters=2, distance=distance, normalize_rows=normalize_rows
+    )
+    return DiviK(
+        kmeans=DunnSearch(single_kmeans, max_clusters=3),
+        fast_kmeans=GAPSearch(single_kmeans, max_clusters=2, n_trials=3),
+        distance=distance,
+        minimal_size=100,
+        filter_type="none",
+    )
+
+
+class CompiledDiviKTest(unittest.TestCase):
+    def setUp(self):
+        self.X, _ = make_blobs(n_samples=2000, n_features=5, centers=6, random_state=0)
+        self.model = _divik("euclidean").fit(self.X)
+
+    def test_predicts_the_same_as_model(self):
+        compiled = self.model.compile()
+        assert compiled.n_nodes > 1
+        npt.assert_equal(compiled.predict(self.X), self.model.labels_)
+
+    def test_transforms_the_same_as_model(self):
+        compiled = self.model.compile()
+        npt.assert_allclose(compiled.transform(self.X), self.model.transform(self.X))
+
+    def test_normalizes_rows_like_model(self):
+        model = _divik("correlation", normalize_rows=True).fit(self.X)
+        compiled = model.compile()
+        assert compiled.normalize_input
+        assert compiled.normalize.any()
+        npt.assert_equal(compiled.predict(self.X), model.predict(self.X))
+        npt.assert_allclose(compiled.transform(self.X), model.transform(self.X))
+
+    def test_predicts_single_cluster_for_unsplit_tree(self):
+        model = _divik("euclidean").set_params(minimal_size=5000).fit(self.X)
+        compiled = model.compile()
+        assert compiled.n_nodes == 0
+        npt.assert_equal(compiled.predict(self.X), 0)
+
+    def test_restores_saved_tree(self):
+        compiled = self.model.compile()
+        with tempfile.TemporaryDirectory() as tmp:
+            fname = os.path.join(tmp, "divik.npz")
+            compiled.save(fname)
+            restored = CompiledDiviK.load(fname)
+        npt.assert_equal(restored.predict(self.X), self.model.labels_)
+        npt.assert_allclose(restored.transform(self.X), compiled.transform(self.X))
+
+    def test_rejects_unknown_distance(self):
+        model = _divik("euclidean").fit(self.X)
+        model.distance = "mahalanobis"
+        with pytest.raises(ValueError):
+            model.compile()
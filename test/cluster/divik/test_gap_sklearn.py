@@ -1,4 +1,5 @@
 import unittest
+from unittest.mock import patch
 
 import numpy as np
 import numpy.testing as npt
@@ -72,6 +73,16 @@ class GapDivikTest(unittest.TestCase):
         reproduced = model.predict(X)
         npt.assert_array_equal(predictions, reproduced)
 
+    def test_predicts_in_chunks(self):
+        X, _ = make_blobs(n_samples=600, n_features=100, centers=20, random_state=42)
+        model = DiviK(full, distance="euclidean")
+        predictions = model.fit_predict(X)
+        with patch("divik.cluster._divik._sklearn.PREDICT_BYTES", 8 * 100 * 64):
+            chunked = model.predict(X)
+            pooled = model.set_params(n_jobs=2).predict(X)
+        npt.assert_array_equal(predictions, chunked)
+        npt.assert_array_equal(predictions, pooled)
+
     def test_works_with_pool(self):
         X, _ = make_blobs(n_samples=600, n_features=100, centers=20, random_state=42)
         sequential = DiviK(full, distance="euclidean")
@@ -3,11 +3,14 @@ from itertools import cycle
 from unittest.mock import MagicMock, patch
 
 import numpy as np
+import numpy.testing as npt
 import pytest
+from sklearn.base import clone
 
 from divik.cluster import _kmeans as km
 from divik.cluster._kmeans import _core as cc
 from divik.cluster._kmeans._core import redefine_centroids
+from divik.core._distance import closest, pairwise, row_norms
 
 from test.cluster.kmeans import data
 
@@ -48,6 +51,23 @@ class CentroidRedefinitionTest(unittest.TestCase):
         with pytest.raises(ValueError):
             redefine_centroids(self.simple_data[:-1], self.labeling, [0, 1])
 
+    def test_returns_cluster_sizes(self):
+        _, counts = redefine_centroids(
+            self.simple_data, self.labeling, [0, 1, 2], return_counts=True
+        )
+        np.testing.assert_equal(counts, [3, 2, 0])
+
+    def test_empty_cluster_has_nan_centroid(self):
+        centroids = redefine_centroids(self.simple_data, self.labeling, [0, 1, 2])
+        np.testing.assert_equal(centroids[:2], self.expected_centroids)
+        assert np.all(np.isnan(centroids[2]))
+
+    def test_fills_provided_buffer(self):
+        out = np.empty((2, 3))
+        centroids = redefine_centroids(self.simple_data, self.labeling, [0, 1], out=out)
+        assert centroids is out
+        np.testing.assert_equal(out, self.expected_centroids)
+
 
 class KMeansTest(unittest.TestCase):
     # noinspection PyTypeChecker
@@ -63,10 +83,16 @@ class KMeansTest(unittest.TestCase):
             initialize=self.mock_initialization,
             number_of_iterations=3,
         )
+        self.counts = np.array([data.shape[0] - 1, 1])
+
+    def redefine(self, centroids=None):
+        return patch.object(
+            km._core, "redefine_centroids", return_value=(centroids, self.counts)
+        )
 
     def test_only_initializes_for_no_iterations(self):
         self.kmeans.number_of_iterations = 0
-        with patch.object(km._core, "redefine_centroids") as mock_redefine:
+        with self.redefine() as mock_redefine:
             labeling, centroids = self.kmeans(data, 2)
         assert 0 == mock_redefine.call_count
         assert 1 == self.mock_initialization.call_count
@@ -75,23 +101,22 @@ class KMeansTest(unittest.TestCase):
         np.testing.assert_equal(self.mocked_initial_centroids, centroids)
 
     def test_initializes_once(self):
-        with patch.object(km._core, "redefine_centroids"):
+        with self.redefine():
             self.kmeans(data, 2)
         assert 1 == self.mock_initialization.call_count
 
     def test_redefines_centroids_each_iteration(self):
-        with patch.object(km._core, "redefine_centroids") as mock_redefine:
+        with self.redefine() as mock_redefine:
             self.kmeans(data, 2)
         assert self.kmeans.number_of_iterations == mock_redefine.call_count
 
     def test_recalculates_labels_on_init_and_each_iteration(self):
-        with patch.object(km._core, "redefine_centroids"):
+        with self.redefine():
             self.kmeans(data, 2)
         assert self.kmeans.number_of_iterations + 1 == self.mock_labeling.call_count
 
     def test_returns_final_labels_and_centroids(self):
-        with patch.object(km._core, "redefine_centroids") as mock_redefine:
-            mock_redefine.return_value = self.mocked_initial_centroids + 3
+        with self.redefine(self.mocked_initial_centroids + 3):
             labeling, centroids = self.kmeans(data, 2)
         np.testing.assert_equal(centroids, self.mocked_initial_centroids + 3)
         np.testing.assert_equal(labeling, self.mocked_labels + 3)
@@ -100,7 +125,7 @@ class KMeansTest(unittest.TestCase):
         constant_labels = self.mocked_labels
         self.mock_labeling.side_effect = None
         self.mock_labeling.return_value = constant_labels
-        with patch.object(km._core, "redefine_centroids") as mock_redefine:
+        with self.redefine() as mock_redefine:
             self.kmeans(data, 2)
         assert 1 == mock_redefine.call_count
 
@@ -136,3 +161,257 @@ class KMeansIntegrationTest(unittest.TestCase):
         labels_are_opposite = labels != expected_labels
         labels_are_valid = np.logical_or(labels_are_the_same, labels_are_opposite)
         assert np.all(labels_are_valid)
+
+    def test_starts_from_leading_precomputed_centroids(self):
+        from sklearn.datasets import make_blobs
+
+        X, _ = make_blobs(n_samples=500, n_features=3, centers=4, random_state=0)
+        seeds = km.KMeans(n_clusters=4, init="kdtree_percentile")._seeds(X, 6)
+        for k in range(2, 6):
+            greedy = km.KMeans(n_clusters=k, init="kdtree_percentile").fit(X)
+            warm = km.KMeans(n_clusters=k, init=seeds).fit(X)
+            npt.assert_equal(greedy.labels_, warm.labels_)
+
+
+class RestartedKMeansTest(unittest.TestCase):
+    def setUp(self):
+        from sklearn.datasets import make_blobs
+
+        self.X, _ = make_blobs(n_samples=600, n_features=3, centers=5, random_state=1)
+
+    def test_keeps_the_best_run(self):
+        single = km.KMeans(n_clusters=5).fit(self.X)
+        restarted = km.KMeans(n_clusters=5, n_init=4, n_jobs=2).fit(self.X)
+        assert restarted.restart_times_.shape == (4,)
+        assert restarted.inertia_ <= single.inertia_
+        _, distances = closest(self.X, restarted.cluster_centers_, "euclidean")
+        npt.assert_allclose(restarted.inertia_, np.sum(distances ** 2))
+
+    def test_is_reproducible(self):
+        first = km.KMeans(n_clusters=5, n_init=3, seed=5).fit(self.X)
+        second = km.KMeans(n_clusters=5, n_init=3, seed=5).fit(self.X)
+        npt.assert_equal(first.labels_, second.labels_)
+
+    def test_restarts_from_precomputed_centroids_differ(self):
+        kmeans = km.KMeans(n_clusters=5, init=self.X[:5], n_init=4)
+        inertias = [kmeans._run(run, self.X)[2] for run in range(4)]
+        assert len(set(inertias)) > 1
+        restarted = kmeans.fit(self.X)
+        assert restarted.inertia_ == min(inertias) < inertias[0]
+
+    def test_works_with_scalable_initialization(self):
+        single = km.KMeans(n_clusters=5, init="kmeans||", n_jobs=2).fit(self.X)
+        restarted = km.KMeans(n_clusters=5, init="kmeans||", n_init=3).fit(self.X)
+        assert np.unique(single.labels_).size == 5
+        assert restarted.inertia_ <= single.inertia_
+
+
+class AcceleratedKMeansTest(unittest.TestCase):
+    def setUp(self):
+        from sklearn.datasets import make_blobs
+
+        self.X, _ = make_blobs(
+            n_samples=1000, n_features=5, centers=6, random_state=0, cluster_std=3
+        )
+
+    def test_elkan_gives_lloyd_results(self):
+        lloyd = km.KMeans(n_clusters=6, algorithm="lloyd").fit(self.X)
+        elkan = km.KMeans(n_clusters=6, algorithm="elkan").fit(self.X)
+        np.testing.assert_equal(elkan.labels_, lloyd.labels_)
+        np.testing.assert_allclose(elkan.cluster_centers_, lloyd.cluster_centers_)
+
+    def test_hamerly_gives_lloyd_results(self):
+        lloyd = km.KMeans(n_clusters=6, algorithm="lloyd").fit(self.X)
+        hamerly = km.KMeans(n_clusters=6, algorithm="hamerly").fit(self.X)
+        np.testing.assert_equal(hamerly.labels_, lloyd.labels_)
+        np.testing.assert_allclose(hamerly.cluster_centers_, lloyd.cluster_centers_)
+
+    def test_restores_vanished_clusters(self):
+        far_away = np.vstack([self.X[:5], 1000 + self.X[:1]])
+        for algorithm in ["lloyd", "elkan", "hamerly"]:
+            kmeans = km._KMeans(
+                labeling=km.Labeling("euclidean"),
+                initialize=MagicMock(return_value=far_away),
+                algorithm=algorithm,
+            )
+            labels, centroids = kmeans(self.X, 6)
+            np.testing.assert_equal(np.unique(labels), np.arange(6))
+            assert not np.isnan(centroids).any()
+
+    def test_throws_for_non_metric_distance(self):
+        kmeans = km.KMeans(n_clusters=2, distance="correlation", algorithm="elkan")
+        with pytest.raises(ValueError):
+            kmeans.fit(self.X)
+
+
+class ClosestCentroidsTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.data = np.random.randn(100, 3)
+        self.centroids = np.random.randn(4, 3)
+
+    def test_matches_full_distance_matrix(self):
+        from scipy.spatial.distance import cdist
+
+        expected = cdist(self.data, self.centroids, "cityblock")
+        labels, distances = closest(self.data, self.centroids, "cityblock")
+        np.testing.assert_equal(labels, expected.argmin(axis=1))
+        np.testing.assert_allclose(distances, expected.min(axis=1))
+
+    def test_matrix_products_match_scipy(self):
+        from scipy.spatial.distance import cdist
+
+        for distance in ["euclidean", "sqeuclidean", "cosine", "correlation"]:
+            expected = cdist(self.data, self.centroids, distance)
+            norms = row_norms(self.data, distance)
+            np.testing.assert_allclose(
+                pairwise(self.data, self.centroids, distance, norms), expected
+            )
+            labels, distances = closest(self.data, self.centroids, distance)
+            np.testing.assert_equal(labels, expected.argmin(axis=1))
+            np.testing.assert_allclose(distances, expected.min(axis=1))
+
+    def test_is_independent_of_block_size(self):
+        labels, distances = closest(self.data, self.centroids, "euclidean")
+        small_labels, small_distances = closest(
+            self.data, self.centroids, "euclidean", max_bytes=7 * 8 * 4
+        )
+        np.testing.assert_equal(small_labels, labels)
+        np.testing.assert_equal(small_distances, distances)
+
+    def test_matrix_products_are_exact_for_close_centroids_far_from_origin(self):
+        from scipy.spatial.distance import cdist
+
+        data = self.data * 1e-3 + 1e4
+        centroids = data[:4] + self.centroids * 1e-4
+        for distance in ["euclidean", "sqeuclidean"]:
+            expected = cdist(data, centroids, distance)
+            np.testing.assert_allclose(
+                pairwise(data, centroids, distance), expected, rtol=1e-6
+            )
+            labels, distances = closest(data, centroids, distance)
+            np.testing.assert_equal(labels, expected.argmin(axis=1))
+            np.testing.assert_allclose(distances, expected.min(axis=1), rtol=1e-6)
+
+    def test_single_precision_matches_double_far_from_origin(self):
+        data = (self.data + 1000).astype(np.float32)
+        centroids = (self.centroids + 1000).astype(np.float32)
+        expected, expected_distances = closest(
+            data.astype(float), centroids.astype(float), "euclidean"
+        )
+        labels, distances = closest(data, centroids, "euclidean")
+        np.testing.assert_equal(labels, expected)
+        np.testing.assert_allclose(distances, expected_distances)
+
+
+class MiniBatchKMeansTest(unittest.TestCase):
+    def setUp(self):
+        from sklearn.datasets import make_blobs
+
+        self.X, self.y = make_blobs(
+            n_samples=3000, n_features=4, centers=3, random_state=0
+        )
+
+    def test_segments_data_with_minibatches(self):
+        from sklearn.metrics import adjusted_rand_score
+
+        kmeans = km.KMeans(n_clusters=3, batch_size=200).fit(self.X)
+        assert adjusted_rand_score(self.y, kmeans.labels_) > 0.95
+
+    def test_counts_final_cluster_sizes(self):
+        kmeans = km.KMeans(n_clusters=3, batch_size=200).fit(self.X)
+        npt.assert_equal(kmeans.counts_, np.bincount(kmeans.labels_, minlength=3))
+
+    def test_continues_full_fit(self):
+        kmeans = km.KMeans(n_clusters=3).fit(self.X)
+        centroids = kmeans.cluster_centers_.copy()
+        kmeans.partial_fit(self.X[:100])
+        assert kmeans._weights.sum() == self.X.shape[0] + 100
+        npt.assert_allclose(kmeans.cluster_centers_, centroids, atol=0.1)
+
+    def test_learns_from_chunks(self):
+        from sklearn.metrics import adjusted_rand_score
+
+        kmeans = km.KMeans(
+            n_clusters=3,
+            distance="correlation",
+            init="kdtree_percentile",
+            normalize_rows=True,
+            batch_size=100,
+        )
+        for chunk in np.array_split(self.X, 5):
+            kmeans.partial_fit(chunk)
+        assert kmeans._weights.sum() == self.X.shape[0]
+        assert kmeans.labels_.size == self.X.shape[0] // 5
+        npt.assert_equal(kmeans.counts_, np.bincount(kmeans.labels_, minlength=3))
+        full = km.KMeans(
+            n_clusters=3,
+            distance="correlation",
+            init="kdtree_percentile",
+            normalize_rows=True,
+        ).fit(self.X)
+        assert adjusted_rand_score(full.labels_, kmeans.predict(self.X)) > 0.95
+
+
+class SinglePrecisionKMeansTest(unittest.TestCase):
+    def setUp(self):
+        from sklearn.datasets import make_blobs
+
+        X, self.y = make_blobs(n_samples=1000, n_features=4, centers=3, random_state=0)
+        self.X = X.astype(np.float32)
+
+    def test_keeps_single_precision(self):
+        for algorithm in ("lloyd", "elkan"):
+            kmeans = km.KMeans(n_clusters=3, algorithm=algorithm).fit(self.X)
+            assert kmeans.cluster_centers_.dtype == np.float32
+            assert kmeans.transform(self.X).shape == (1000, 3)
+
+    def test_gives_double_precision_results(self):
+        single = km.KMeans(n_clusters=3).fit(self.X)
+        double = km.KMeans(n_clusters=3).fit(self.X.astype(float))
+        npt.assert_equal(single.labels_, double.labels_)
+        npt.assert_allclose(
+            single.cluster_centers_, double.cluster_centers_, rtol=1e-5
+        )
+
+    def test_labels_data_far_from_origin_like_double_precision(self):
+        X = self.X + np.float32(30000)
+        single = km.KMeans(n_clusters=3).fit(X)
+        double = km.KMeans(n_clusters=3).fit(X.astype(float))
+        npt.assert_equal(single.labels_, double.labels_)
+        npt.assert_equal(single.predict(X), double.labels_)
+
+
+class BatchedKMeansTest(unittest.TestCase):
+    def setUp(self):
+        self.X = np.random.RandomState(0).rand(6, 300, 4)
+
+    def test_matches_separate_fits(self):
+        for distance, normalize in (("euclidean", False), ("correlation", True)):
+            for n_clusters in (1, 2, 5):
+                kmeans = km.KMeans(
+                    n_clusters=n_clusters, distance=distance, normalize_rows=normalize
+                )
+                expected = [clone(kmeans).fit_predict(x) for x in self.X]
+                npt.assert_equal(kmeans.fit_predict_many(self.X), expected)
+
+    def test_falls_back_to_separate_fits(self):
+        kmeans = km.KMeans(n_clusters=3, distance="cityblock")
+        expected = [clone(kmeans).fit_predict(x) for x in self.X]
+        npt.assert_equal(kmeans.fit_predict_many(self.X), expected)
+        assert not hasattr(kmeans, "labels_")
+
+    def test_single_precision_matches_double_far_from_origin(self):
+        from sklearn.datasets import make_blobs
+
+        X = np.stack(
+            [
+                make_blobs(n_samples=300, n_features=4, random_state=seed)[0]
+                for seed in range(6)
+            ]
+        )
+        X = (X + 30000).astype(np.float32)
+        kmeans = km.KMeans(n_clusters=3)
+        npt.assert_equal(
+            kmeans.fit_predict_many(X), kmeans.fit_predict_many(X.astype(float))
+        )
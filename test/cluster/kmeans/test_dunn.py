@@ -1,6 +1,8 @@
 import unittest
 
+import numpy as np
 from parameterized import parameterized
+from sklearn import cluster
 from sklearn.datasets import make_blobs
 from sklearn.metrics import adjusted_rand_score
 
@@ -20,6 +22,10 @@ def data(n_clusters):
     )
 
 
+class _SklearnKMeans(cluster.KMeans):
+    distance = "euclidean"
+
+
 class DunnSearchTest(unittest.TestCase):
     # Simplified Dunn favorizes small number of clusters.
     @parameterized.expand([("{}_clusters".format(k), k) for k in [2, 3, 4]])
@@ -71,6 +77,64 @@ class DunnSearchTest(unittest.TestCase):
         assert rand > 0.75
         assert kmeans.estimators_ is None
 
+    def test_prefix_sweep_matches_independent_initialization(self):
+        X, _ = data(4)
+        single_kmeans = KMeans(n_clusters=2, init="kdtree_percentile")
+        prefix = DunnSearch(single_kmeans, max_clusters=6, sweep="prefix").fit(X)
+        independent = DunnSearch(single_kmeans, max_clusters=6).fit(X)
+        np.testing.assert_equal(prefix.scores_, independent.scores_)
+        for fast, slow in zip(prefix.estimators_, independent.estimators_):
+            np.testing.assert_equal(fast.labels_, slow.labels_)
+            assert fast.init == "kdtree_percentile"
+
+    def test_sweep_falls_back_to_independent_for_other_estimators(self):
+        X, _ = data(3)
+        single_kmeans = _SklearnKMeans(n_clusters=2, n_init=1, random_state=0)
+        for sweep in ["prefix", "warm"]:
+            kmeans = DunnSearch(single_kmeans, max_clusters=4, sweep=sweep).fit(X)
+            assert kmeans.n_clusters_ == 3
+
+    def test_works_with_warm_start(self):
+        n_clusters = 3
+        X, y = data(n_clusters)
+        single_kmeans = KMeans(n_clusters=2, init="kdtree")
+        kmeans = DunnSearch(single_kmeans, max_clusters=10, sweep="warm").fit(X)
+        rand = adjusted_rand_score(y, kmeans.labels_)
+        assert n_clusters == kmeans.n_clusters_
+        assert rand > 0.75
+
+    def test_halving_scores_only_promising_numbers_of_clusters(self):
+        n_clusters = 4
+        X, y = data(n_clusters)
+        single_kmeans = KMeans(n_clusters=2, init="kdtree")
+        kmeans = DunnSearch(
+            single_kmeans, max_clusters=10, strategy="halving", halving_size=500
+        ).fit(X)
+        assert n_clusters == kmeans.n_clusters_
+        assert adjusted_rand_score(y, kmeans.labels_) > 0.75
+        assert len(kmeans.evaluated_) < 9
+        assert kmeans.rounds_[0][0] == 500
+        np.testing.assert_equal(kmeans.rounds_[0][1], np.arange(2, 11))
+
+    def test_reuses_fitted_kmeans_of_the_same_configuration(self):
+        X, _ = data(3)
+        fitted = KMeans(n_clusters=2, init="kdtree").fit(X)
+        other = KMeans(n_clusters=3, init="kdtree", max_iter=10).fit(X)
+        single_kmeans = KMeans(n_clusters=2, init="kdtree")
+        search = DunnSearch(single_kmeans, max_clusters=5)
+        reusing = search.fit(X, fitted=[fitted, other])
+        assert reusing.estimators_[0] is fitted
+        assert reusing.estimators_[1] is not other
+        fresh = DunnSearch(single_kmeans, max_clusters=5).fit(X)
+        np.testing.assert_equal(reusing.scores_, fresh.scores_)
+
+    def test_runs_restarts_of_kmeans_within_concurrent_search(self):
+        X, _ = data(3)
+        single_kmeans = KMeans(n_clusters=2, init="kdtree", n_init=2, n_jobs=2)
+        concurrent = DunnSearch(single_kmeans, max_clusters=4, n_jobs=2).fit(X)
+        sequential = DunnSearch(single_kmeans, max_clusters=4).fit(X)
+        np.testing.assert_equal(concurrent.scores_, sequential.scores_)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,5 +1,7 @@
 import unittest
 
+import numpy.testing as npt
+
 from parameterized import parameterized
 from sklearn.datasets import make_blobs
 from sklearn.metrics import adjusted_rand_score
@@ -47,6 +49,35 @@ class GAPSearchTest(unittest.TestCase):
         assert rand > 0.75
         assert kmeans.estimators_ is None
 
+    @parameterized.expand([("full", 10000), ("sampled", 1000)])
+    def test_works_with_reused_references(self, _, sample_size):
+        n_clusters = 3
+        X, y = data(n_clusters)
+        single_kmeans = KMeans(n_clusters=2)
+        kmeans = GAPSearch(
+            single_kmeans,
+            max_clusters=10,
+            sample_size=sample_size,
+            reuse_references=True,
+        ).fit(X)
+        rand = adjusted_rand_score(y, kmeans.labels_)
+        # allow for misidentification of 1 cluster
+        assert kmeans.n_clusters_ + 1 >= n_clusters
+        assert kmeans.n_clusters_ - 1 <= n_clusters
+        assert rand > 0.75
+
+    def test_speculation_does_not_change_result(self):
+        X, _ = data(3)
+        single_kmeans = KMeans(n_clusters=2)
+        sequential = GAPSearch(single_kmeans, max_clusters=10, sample_size=100)
+        sequential.fit(X)
+        speculative = GAPSearch(
+            single_kmeans, max_clusters=10, sample_size=100, n_jobs=3, speculation=3
+        ).fit(X)
+        assert speculative.n_clusters_ == sequential.n_clusters_
+        npt.assert_array_equal(speculative.scores_, sequential.scores_)
+        npt.assert_array_equal(speculative.labels_, sequential.labels_)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -6,12 +6,18 @@ import numpy as np
 import pytest
 
 from divik.cluster._kmeans import _initialization as km
+from divik.cluster._kmeans._core import KMeans
+from divik.core import maybe_pool
 
 
 def measure(func):
     return create_autospec(func, side_effect=func)
 
 
+def _scalable_initialization(X):
+    return km.ScalableInitialization("euclidean", n_jobs=2, seed=3)(X, 4)
+
+
 class ExtremeInitializationTest(unittest.TestCase):
     def setUp(self):
         self.number_of_clusters = 2
@@ -58,3 +64,60 @@ class KDTreePercentileInitializationTest(unittest.TestCase):
 
     def test_works_for_sample_data(self):
         self.initialize(data, self.number_of_clusters)
+
+
+class MakeLeavesTest(unittest.TestCase):
+    def setUp(self):
+        self.X = np.random.RandomState(0).randn(1000, 3)
+        self.leaves = km.make_leaves(self.X, leaf_size=20)
+
+    def test_boxes_partition_the_data(self):
+        np.testing.assert_equal(np.sort(self.leaves.index), np.arange(1000))
+        np.testing.assert_equal(self.leaves.start[1:], self.leaves.end[:-1])
+        assert self.leaves.count.sum() == 1000
+
+    def test_boxes_are_split_up_to_desired_size(self):
+        assert np.all(self.leaves.count < 2 * 20)
+
+    def test_centroids_are_box_means(self):
+        for start, end, centroid in zip(*self.leaves[1:4]):
+            box = self.X[self.leaves.index[start:end]]
+            np.testing.assert_allclose(centroid, box.mean(axis=0))
+
+
+class ScalableInitializationTest(unittest.TestCase):
+    def setUp(self):
+        from sklearn.datasets import make_blobs
+
+        self.X, self.y = make_blobs(
+            n_samples=2000, n_features=5, centers=4, random_state=0
+        )
+
+    def test_finds_a_centroid_in_each_cluster(self):
+        initialize = km.ScalableInitialization("euclidean", seed=3)
+        centroids = initialize(self.X, 4)
+        labels, _ = km.closest(self.X, centroids, "euclidean")
+        assert np.unique(labels[self.y == 0]).size == 1
+        assert np.unique(labels).size == 4
+
+    @patch("divik.cluster._kmeans._initialization.CHUNK_BYTES", 8 * 5 * 300)
+    def test_does_not_depend_on_the_number_of_jobs(self):
+        single = km.ScalableInitialization("correlation", seed=3)(self.X, 4)
+        parallel = km.ScalableInitialization("correlation", n_jobs=2, seed=3)(
+            self.X, 4
+        )
+        np.testing.assert_equal(single, parallel)
+
+    @patch("divik.cluster._kmeans._initialization.CHUNK_BYTES", 8 * 5 * 300)
+    def test_kmeans_does_not_depend_on_the_number_of_jobs(self):
+        single = KMeans(n_clusters=4, init="kmeans||", seed=3).fit(self.X)
+        parallel = KMeans(n_clusters=4, init="kmeans||", seed=3, n_jobs=2)
+        parallel.fit(self.X)
+        np.testing.assert_equal(single.cluster_centers_, parallel.cluster_centers_)
+        np.testing.assert_equal(single.labels_, parallel.labels_)
+
+    def test_runs_within_pool_worker(self):
+        with maybe_pool(2) as pool:
+            (nested,) = pool.map(_scalable_initialization, [self.X])
+        expected = km.ScalableInitialization("euclidean", seed=3)(self.X, 4)
+        np.testing.assert_equal(nested, expected)
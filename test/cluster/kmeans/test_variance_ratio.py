@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+from parameterized import parameterized
+from sklearn.datasets import make_blobs
+from sklearn.metrics import adjusted_rand_score
+
+from divik.cluster._kmeans._core import KMeans
+from divik.cluster._kmeans._variance_ratio import VarianceRatioSearch
+
+
+def data(n_clusters):
+    return make_blobs(n_samples=10000, n_features=2, centers=n_clusters, random_state=0)
+
+
+class VarianceRatioSearchTest(unittest.TestCase):
+    @parameterized.expand([("{}_clusters".format(k), k) for k in [2, 3, 4]])
+    def test_finds_number_of_clusters(self, _, n_clusters):
+        X, y = data(n_clusters)
+        single_kmeans = KMeans(n_clusters=2, init="kdtree")
+        kmeans = VarianceRatioSearch(single_kmeans, max_clusters=10).fit(X)
+        assert n_clusters == kmeans.n_clusters_
+        assert adjusted_rand_score(y, kmeans.labels_) > 0.75
+        assert len(kmeans.scores_) == 9
+
+    def test_stops_for_single_cluster(self):
+        X = np.random.RandomState(0).randn(5000, 2)
+        single_kmeans = KMeans(n_clusters=2)
+        kmeans = VarianceRatioSearch(single_kmeans, max_clusters=2, min_clusters=1)
+        assert kmeans.fit(X).n_clusters_ == 1
+
+    def test_splits_separated_clusters(self):
+        X, _ = data(3)
+        single_kmeans = KMeans(n_clusters=2)
+        kmeans = VarianceRatioSearch(single_kmeans, max_clusters=2, min_clusters=1)
+        assert kmeans.fit(X).n_clusters_ == 2
+
+    def test_works_with_unfit_removal(self):
+        X, _ = data(3)
+        single_kmeans = KMeans(n_clusters=2)
+        kmeans = VarianceRatioSearch(
+            single_kmeans, max_clusters=5, drop_unfit=True
+        ).fit(X)
+        assert kmeans.estimators_ is None
+        assert kmeans.n_clusters_ == 3
+
+
+if __name__ == "__main__":
+    unittest.main()
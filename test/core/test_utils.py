@@ -2,6 +2,9 @@ import os
 import unittest
 from unittest.mock import patch
 
+import numpy as np
+import numpy.testing as npt
+
 import divik.core as u
 
 
@@ -43,3 +46,16 @@ class BuildTest(unittest.TestCase):
         dummy = u.build(Dummy, a=3, c=4)
         assert dummy.a == 3
         assert dummy.b == 5
+
+
+class NormalizeRowsTest(unittest.TestCase):
+    def test_keeps_single_precision(self):
+        data = np.random.RandomState(0).rand(10, 5).astype(np.float32)
+        normalized = u.normalize_rows(data)
+        assert normalized.dtype == np.float32
+        npt.assert_allclose(normalized.mean(axis=1), 0, atol=1e-6)
+        npt.assert_allclose(np.linalg.norm(normalized, axis=1), 1, rtol=1e-6)
+
+    def test_promotes_integers_to_double_precision(self):
+        data = np.arange(12).reshape(3, 4)
+        assert u.normalize_rows(data).dtype == np.float64
@@ -0,0 +1,39 @@
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+
+from divik.sampler._precomputed_sampler import PrecomputedSampler
+from divik.sampler._uniform_sampler import UniformSampler
+
+
+def data():
+    return np.random.RandomState(0).randn(100, 3)
+
+
+class PrecomputedSamplerTest(unittest.TestCase):
+    def test_draws_samples_of_source_sampler(self):
+        source = UniformSampler(n_rows=10).fit(data())
+        sampler = PrecomputedSampler.draw(source, n_samples=5, seed=3)
+        assert sampler.samples.shape == (5, 10, 3)
+        for i in range(5):
+            npt.assert_array_equal(sampler.get_sample(i), source.get_sample(3 + i))
+
+    def test_distinct_samples_for_coprime_step(self):
+        source = UniformSampler(n_rows=10).fit(data())
+        sampler = PrecomputedSampler.draw(source, n_samples=10)
+        samples = [sampler.get_sample(7 + 40013 * i) for i in range(10)]
+        firsts = {tuple(sample[0]) for sample in samples}
+        assert len(firsts) == 10
+
+    def test_parallel_sampler_generates_same_values(self):
+        source = UniformSampler(n_rows=10).fit(data())
+        sampler = PrecomputedSampler.draw(source, n_samples=4)
+        with sampler.parallel() as sampler_:
+            sampler_.initializer(*sampler_.initargs)
+            for i in range(4):
+                npt.assert_array_equal(sampler_.get_sample(i), sampler.get_sample(i))
+
+
+if __name__ == "__main__":
+    unittest.main()
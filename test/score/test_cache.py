@@ -0,0 +1,85 @@
+import os
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from sklearn.datasets import make_blobs
+
+import divik.cluster as km
+from divik.score import cached_distances, dunn, sampled_dunn
+from divik.score import _cache
+from divik.score._cache import DistanceCache
+from divik.score._gap import _dispersion
+
+
+class TestDistanceCache(unittest.TestCase):
+    def test_reuses_matrix_for_the_same_data(self):
+        X = np.random.RandomState(0).rand(100, 3)
+        cache = DistanceCache(max_bytes=10 ** 6)
+        assert cache(X, "euclidean") is cache(X.copy(), "euclidean")
+        assert cache(X, "euclidean") is not cache(X, "cityblock")
+
+    def test_evicts_least_recently_used(self):
+        X = np.random.RandomState(0).rand(100, 3)
+        cache = DistanceCache(max_bytes=2 * 100 ** 2 * 8)
+        first = cache(X, "euclidean")
+        cache(X, "cityblock")
+        cache(X, "euclidean")
+        cache(X, "chebyshev")
+        assert cache(X, "euclidean") is first
+
+    def test_skips_data_over_the_budget(self):
+        X = np.random.RandomState(0).rand(100, 3)
+        assert DistanceCache(max_bytes=1000)(X, "euclidean") is None
+
+
+class TestCachedScores(unittest.TestCase):
+    def setUp(self):
+        self.X, _ = make_blobs(n_samples=500, n_features=3, centers=4, random_state=0)
+
+    def test_give_the_same_scores(self):
+        for k in range(2, 6):
+            kmeans = km.KMeans(n_clusters=k).fit(self.X)
+            expected = dunn(kmeans, self.X, inter="closest", intra="furthest")
+            dispersion = _dispersion(self.X, kmeans)
+            with cached_distances():
+                cached = dunn(kmeans, self.X, inter="closest", intra="furthest")
+                np.testing.assert_allclose(_dispersion(self.X, kmeans), dispersion)
+            np.testing.assert_allclose(cached, expected)
+
+    def test_scores_samples_without_cache(self):
+        kmeans = km.KMeans(n_clusters=3).fit(self.X)
+        expected = sampled_dunn(kmeans, self.X, sample_size=100, n_trials=3)
+        with cached_distances() as cache, patch.object(
+            _cache, "_distance_matrix", side_effect=_cache._distance_matrix
+        ) as m:
+            cached = sampled_dunn(kmeans, self.X, sample_size=100, n_trials=3)
+        assert m.call_count == 0
+        assert cache._bytes == 0
+        np.testing.assert_allclose(cached, expected)
+
+    def test_dunn_search_selects_the_same_model(self):
+        kmeans = km.KMeans(n_clusters=2)
+        params = dict(max_clusters=6, inter="closest", intra="furthest")
+        expected = km.DunnSearch(kmeans, **params).fit(self.X)
+        cached = km.DunnSearch(kmeans, distance_cache=2 ** 24, **params).fit(self.X)
+        np.testing.assert_allclose(cached.scores_, expected.scores_)
+
+    def test_dunn_search_computes_the_matrix_once_for_all_jobs(self):
+        parent = os.getpid()
+        compute = _cache._distance_matrix
+
+        def in_parent_only(*args):
+            if os.getpid() != parent:
+                raise RuntimeError("Distance matrix computed by a worker")
+            return compute(*args)
+
+        kmeans = km.KMeans(n_clusters=2)
+        params = dict(max_clusters=6, inter="closest", intra="furthest")
+        expected = km.DunnSearch(kmeans, **params).fit(self.X)
+        with patch.object(_cache, "_distance_matrix", side_effect=in_parent_only) as m:
+            cached = km.DunnSearch(
+                kmeans, distance_cache=2 ** 24, n_jobs=2, **params
+            ).fit(self.X)
+        assert m.call_count == 1
+        np.testing.assert_allclose(cached.scores_, expected.scores_)
@@ -8,6 +8,7 @@ from divik.score._dunn import (
     _inter_centroid,
     _inter_closest,
     _intra_avg,
+    _diameter,
     _intra_furthest,
     dunn,
     sampled_dunn,
@@ -43,6 +44,52 @@ class TestDunnDistances(unittest.TestCase):
         assert round(abs(dst - 2.0), 7) == 0
 
 
+class TestDiameter(unittest.TestCase):
+    def setUp(self):
+        self.X = np.random.RandomState(0).randn(700, 5)
+
+    def test_matches_full_distance_matrix(self):
+        from scipy.spatial.distance import pdist
+
+        for distance in ["euclidean", "cityblock", "chebyshev", "correlation"]:
+            expected = pdist(self.X, distance).max()
+            np.testing.assert_allclose(_diameter(self.X, distance), expected)
+
+    def test_is_bounded_with_tolerance(self):
+        from scipy.spatial.distance import pdist
+
+        expected = pdist(self.X).max()
+        approximated = _diameter(self.X, "euclidean", tolerance=0.1)
+        assert expected / 1.1 <= approximated <= expected + 1e-12
+
+    def test_is_zero_for_single_point(self):
+        assert _diameter(self.X[:1], "euclidean") == 0.0
+
+
+class TestInterClosest(unittest.TestCase):
+    def test_matches_full_distance_matrix(self):
+        from scipy.spatial.distance import cdist
+
+        # KD-tree serves the low dimensional data only
+        for n_features in [4, 40]:
+            X, y = make_blobs(
+                n_samples=600, n_features=n_features, centers=3, random_state=0
+            )
+
+            class Fitted(DummyKMeans):
+                n_clusters = 3
+                labels_ = y
+
+            for distance in ["euclidean", "cityblock", "chebyshev", "correlation"]:
+                Fitted.distance = distance
+                expected = min(
+                    cdist(X[y == i], X[y == j], distance).min()
+                    for i in range(3)
+                    for j in range(i + 1, 3)
+                )
+                np.testing.assert_allclose(_inter_closest(Fitted(), X), expected)
+
+
 class TestDunn(unittest.TestCase):
     def test_computes_inter_to_intracluster_distances_rate(self):
         data = np.array([[1], [3], [4], [6]])
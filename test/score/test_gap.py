@@ -44,3 +44,10 @@ class TestGap(unittest.TestCase):
         kmeans = KMeans(n_clusters=2, random_state=42, max_iter=2).fit(self.X)
         score = sc.gap(self.X, kmeans)
         assert not np.isnan(score)
+
+    def test_batched_gives_the_same_score(self):
+        expected = sc.gap(self.X, self.kmeans_3, n_trials=5, return_deviation=True)
+        batched = sc.gap(
+            self.X, self.kmeans_3, n_trials=5, return_deviation=True, batched=True
+        )
+        np.testing.assert_allclose(batched, expected)
@@ -0,0 +1,36 @@
+import unittest
+
+import numpy as np
+from scipy.spatial.distance import pdist
+
+from divik.score._kernels import group, max_pairwise, mean_distances, mean_pairwise
+
+
+class TestGroup(unittest.TestCase):
+    def test_slices_contain_members_of_a_label(self):
+        labels = np.array([2, 0, 2, 5, 0, 2])
+        groups = group(labels)
+        np.testing.assert_equal(groups.labels, [0, 2, 5])
+        np.testing.assert_equal(groups.members(0), [1, 4])
+        np.testing.assert_equal(groups.members(1), [0, 2, 5])
+        np.testing.assert_equal(groups.tail(0), [0, 2, 5, 3])
+
+
+class TestPairwiseReductions(unittest.TestCase):
+    def setUp(self):
+        self.X = np.random.RandomState(0).rand(3000, 4)
+
+    def test_match_full_distance_matrix(self):
+        for distance in ["euclidean", "cityblock", "correlation"]:
+            expected = pdist(self.X, distance)
+            np.testing.assert_allclose(
+                mean_pairwise(self.X, distance), expected.mean()
+            )
+            np.testing.assert_allclose(max_pairwise(self.X, distance), expected.max())
+
+    def test_skip_single_member_clusters(self):
+        labels = np.zeros(self.X.shape[0], dtype=int)
+        labels[:2] = [1, 2]
+        distances = mean_distances(self.X, labels, "euclidean")
+        assert len(distances) == 1
+        np.testing.assert_allclose(distances[0], pdist(self.X[2:]).mean())
@@ -26,3 +26,8 @@ class TestSamplingGap(unittest.TestCase):
         gap, std = sc.sampled_gap(self.X, self.kmeans_3, return_deviation=True)
         assert gap is not None
         assert std is not None
+
+    def test_batched_gives_the_same_score(self):
+        expected = sc.sampled_gap(self.X, self.kmeans_3, n_trials=5)
+        batched = sc.sampled_gap(self.X, self.kmeans_3, n_trials=5, batched=True)
+        np.testing.assert_allclose(batched, expected)
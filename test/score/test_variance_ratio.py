@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+from sklearn.datasets import make_blobs
+from sklearn.metrics import calinski_harabasz_score
+
+import divik.cluster as km
+import divik.score as sc
+
+
+class TestVarianceRatio(unittest.TestCase):
+    def setUp(self):
+        self.X, _ = make_blobs(n_samples=3000, n_features=5, centers=3, random_state=0)
+
+    def test_matches_calinski_harabasz(self):
+        kmeans = km.KMeans(n_clusters=3).fit(self.X)
+        score = sc.variance_ratio(kmeans, self.X)
+        np.testing.assert_allclose(
+            score, calinski_harabasz_score(self.X, kmeans.labels_)
+        )
+
+    def test_good_labeling_has_greater_score(self):
+        better = sc.variance_ratio(km.KMeans(n_clusters=3).fit(self.X), self.X)
+        worse = sc.variance_ratio(km.KMeans(n_clusters=7).fit(self.X), self.X)
+        assert better > worse
+
+    def test_single_cluster_has_lowest_score(self):
+        kmeans = km.KMeans(n_clusters=1).fit(self.X)
+        assert sc.variance_ratio(kmeans, self.X) == -np.inf
+
+    def test_uses_normalized_rows(self):
+        kmeans = km.KMeans(n_clusters=3, distance="correlation", normalize_rows=True)
+        kmeans.fit(self.X)
+        normalized = kmeans._prepare(self.X)
+        np.testing.assert_allclose(
+            sc.variance_ratio(kmeans, self.X),
+            calinski_harabasz_score(normalized, kmeans.labels_),
+        )
+
+
+class TestDudaHart(unittest.TestCase):
+    def test_splits_separated_clusters(self):
+        X, _ = make_blobs(n_samples=3000, n_features=5, centers=2, random_state=0)
+        assert sc.duda_hart(km.KMeans(n_clusters=2).fit(X), X)
+
+    def test_keeps_single_normal_cluster(self):
+        X = np.random.RandomState(0).randn(3000, 5)
+        assert not sc.duda_hart(km.KMeans(n_clusters=2).fit(X), X)